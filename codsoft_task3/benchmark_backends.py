@@ -0,0 +1,116 @@
+import argparse
+import difflib
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ==========================================
+# INFERENCE BACKEND BENCHMARK
+# ==========================================
+# Runs each caption_model backend (eager fp32, int8, bf16, onnx, compile) in
+# its own process and reports load time, single-image latency, batched
+# throughput and peak RSS. It also reports how closely each backend's captions
+# match the eager fp32 captions of the same images: the share of identical
+# captions, and the mean word-level similarity.
+
+DEFAULT_IMAGES = ["sample_image.jpg", "image1.jpg"]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def run_backend(backend, paths, repeats, batch_size):
+    """Runs in a fresh process so memory and compiled graphs don't leak between backends."""
+    import caption_model
+    import run_captioning
+
+    caption_model.set_default_backend(backend)
+    loaded = caption_model.get_model()
+    warmup_seconds = loaded.warm_up()
+
+    images = [run_captioning.load_image(p) for p in paths]
+    captions = run_captioning.caption_batch(images)
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        run_captioning.caption_batch([images[i % len(images)]])
+        latencies.append(time.perf_counter() - start)
+
+    batch = [images[i % len(images)] for i in range(batch_size)]
+    start = time.perf_counter()
+    run_captioning.caption_batch(batch)
+    batch_seconds = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "backend": loaded.backend,  # bf16 reports "eager" if it fell back
+        "load_s": round(loaded.load_seconds, 2),
+        "warmup_s": round(warmup_seconds, 2),
+        "latency_ms": {"p50": round(float(np.percentile(ms, 50)), 1), "p90": round(float(np.percentile(ms, 90)), 1)},
+        "throughput_ips": round(batch_size / batch_seconds, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        "captions": dict(zip(paths, captions)),
+    }
+
+
+def agreement(captions, reference):
+    """(share of identical captions, mean word-level similarity) against the reference."""
+    same, similarity = [], []
+    for path, ref in reference.items():
+        caption = captions.get(path, "")
+        same.append(caption == ref)
+        similarity.append(difflib.SequenceMatcher(None, caption.split(), ref.split()).ratio())
+    return round(float(np.mean(same)), 3), round(float(np.mean(similarity)), 3)
+
+
+def main():
+    from caption_model import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Compare BLIP captioning backends on this machine.")
+    parser.add_argument("paths", nargs="*", default=DEFAULT_IMAGES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=10, help="single-image captions timed per backend")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", default="backend_results.json")
+    args = parser.parse_args()
+
+    backends = ["eager"] + [b for b in args.backends if b != "eager"]  # eager is the reference
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in backends:
+        print(f"Running '{backend}'...")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[backend] = pool.submit(run_backend, backend, args.paths, args.repeats, args.batch_size).result()
+        except Exception as e:  # e.g. onnxruntime not installed
+            print(f"  skipped: {e}")
+
+    reference = results.get("eager", {}).get("captions", {})
+    for result in results.values():
+        result["exact_match"], result["word_similarity"] = agreement(result["captions"], reference)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'backend':>8} | {'load s':>6} | {'p50 ms':>8} | {'img/s':>6} | {'RSS MB':>7} | {'exact':>5} | {'words':>5}")
+    print("-" * 64)
+    for name, r in results.items():
+        print(f"{name:>8} | {r['load_s']:>6.1f} | {r['latency_ms']['p50']:>8.1f} | {r['throughput_ips']:>6.2f} | "
+              f"{r['peak_rss_mb'] or 0:>7.0f} | {r['exact_match']:>5.2f} | {r['word_similarity']:>5.2f}")
+    print(f"\nCaptions and full results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
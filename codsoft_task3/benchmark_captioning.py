@@ -0,0 +1,77 @@
+import argparse
+import time
+
+import torch
+
+from caption_model import BACKENDS, set_default_backend
+from prefetch_loader import StageTimings
+from run_captioning import caption_batch, caption_images, load_image, load_model
+
+# ==========================================
+# BATCHED CAPTIONING THROUGHPUT BENCHMARK
+# ==========================================
+# Captions the same set of images with one generate() call per batch and
+# reports images/second for each batch size. Images are decoded up front so
+# only preprocessing + generation is timed. Uses the bundled sample images,
+# repeated to --images, unless image paths are given. The last table captions
+# the files end to end, decoding inline vs. with the prefetching loader.
+
+
+def run(images, batch_size, device):
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        caption_batch(images[i:i + batch_size])
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Images/sec of run_captioning at several batch sizes.")
+    parser.add_argument("paths", nargs="*", default=["sample_image.jpg", "image1.jpg"])
+    parser.add_argument("--images", type=int, default=32, help="images captioned per batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workers", type=int, default=4, help="decode threads for the prefetching run")
+    parser.add_argument("--backend", choices=BACKENDS, help="inference backend (default: $BLIP_BACKEND or eager)")
+    args = parser.parse_args()
+    if args.backend:
+        set_default_backend(args.backend)
+
+    decoded = [load_image(p) for p in args.paths]
+    images = [decoded[i % len(decoded)] for i in range(args.images)]
+
+    # Startup and warm-up (kernel selection, allocator) are reported, not timed below
+    loaded = load_model(warmup=True)
+    # Device and precision of the backend actually loaded (int8/onnx run on the CPU in fp32, bf16 in bfloat16)
+    print(f"Backend: {loaded.backend} | Device: {loaded.device} | Precision: {loaded.dtype} | "
+          f"{len(images)} images per run")
+    print(f"{'batch':>5} | {'seconds':>8} | {'images/s':>8} | {'speedup':>7}")
+    print("-" * 38)
+    baseline = None
+    for batch_size in args.batch_sizes:
+        elapsed = run(images, batch_size, loaded.device)
+        throughput = len(images) / elapsed
+        baseline = baseline or throughput
+        print(f"{batch_size:>5} | {elapsed:>8.2f} | {throughput:>8.2f} | {throughput / baseline:>6.2f}x")
+
+    paths = [args.paths[i % len(args.paths)] for i in range(args.images)]
+    batch_size = max(args.batch_sizes)
+    start = time.perf_counter()
+    for i in range(0, len(paths), batch_size):
+        caption_batch([load_image(p) for p in paths[i:i + batch_size]])
+    inline = time.perf_counter() - start
+
+    timings = StageTimings()
+    start = time.perf_counter()
+    for _ in caption_images(paths, batch_size, args.workers, timings):
+        pass
+    prefetched = time.perf_counter() - start
+
+    print(f"\nEnd to end from files (batch {batch_size}):")
+    print(f"  inline decode: {len(paths) / inline:.2f} images/s")
+    print(f"  prefetching ({args.workers} workers): {len(paths) / prefetched:.2f} images/s")
+    print(timings.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# CAPTION RESULT CACHE
+# ==========================================
+# Beam search is by far the most expensive step, and the same images keep
+# getting captioned again. This cache maps
+#     hash(image file bytes) + hash(model weights, backend, decoding settings)
+# to the caption:
+#   - memory tier: LRU bounded by max_entries
+#   - SQLite tier (optional): one db file, safe to share between processes
+#     (WAL journal, so readers never block the writer)
+# The settings hash is part of every key. Changing the model snapshot, backend,
+# device, dtype or GENERATION_KWARGS therefore misses on everything cached before
+# (fp16 GPU and fp32 CPU captions can differ, and one SQLite file may serve both).
+# prune_stale() deletes those old rows.
+
+
+def settings_namespace(model_fingerprint, backend, generation_kwargs, device=None, dtype=None):
+    """Short hash of everything besides the image that decides the caption."""
+    settings = json.dumps({"model": model_fingerprint, "backend": backend, "generate": generation_kwargs,
+                           "device": device, "dtype": dtype}, sort_keys=True, default=str)
+    return hashlib.blake2b(settings.encode(), digest_size=8).hexdigest()
+
+
+class CaptionCache:
+    def __init__(self, max_entries=10_000, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # sqlite3 connections can't be shared across threads
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            self._db().execute("CREATE TABLE IF NOT EXISTS captions "
+                               "(key TEXT PRIMARY KEY, namespace TEXT, caption TEXT, created REAL)")
+
+    # --- keys ---
+
+    @staticmethod
+    def file_key(path):
+        """Hash of a whole image file."""
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(image_key, namespace):
+        return f"{namespace}:{image_key}"
+
+    # --- tiers ---
+
+    def _db(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        with self._lock:
+            caption = self._memory.get(key)
+            if caption is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return caption
+
+        if self.db_path:
+            row = self._db().execute("SELECT caption FROM captions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key, caption):
+        with self._lock:
+            self._memory[key] = caption
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, key, caption):
+        self._remember(key, caption)
+        if self.db_path:
+            namespace = key.split(":", 1)[0]
+            self._db().execute("INSERT OR REPLACE INTO captions VALUES (?, ?, ?, ?)",
+                               (key, namespace, caption, time.time()))
+
+    def prune_stale(self, namespace):
+        """Deletes persisted captions made with other model/decoding settings; returns how many."""
+        if not self.db_path:
+            return 0
+        return self._db().execute("DELETE FROM captions WHERE namespace != ?", (namespace,)).rowcount
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "entries": len(self._memory),
+        }
@@ -33,10 +33,17 @@ class ImageCaptioningModel(nn.Module):
         # --- 3. OUTPUT ---
         self.fc_out = nn.Linear(hidden_size, vocab_size)
 
+    def encode_image(self, images):
+        """Frozen VGG16 features, flattened to 25088 per image (what the feature store holds)."""
+        features = self.vgg(images)
+        return features.view(features.size(0), -1) # Flatten
+
     def forward(self, images, captions):
+        return self.forward_features(self.encode_image(images), captions)
+
+    def forward_features(self, features, captions):
+        """Same as forward(), starting from encode_image() output (used for training from the feature store)."""
         # Image Features
-        features = self.vgg(images)
-        features = features.view(features.size(0), -1) # Flatten
         features = self.fc_image(features)
         features = self.dropout_img(features)
         features = features.unsqueeze(1) # Add sequence dim
@@ -62,5 +69,6 @@ if __name__ == "__main__":
         print("\nSUCCESS: Model Architecture defined.")
         print(model)
         print("\nNote: This is the raw architecture. To use it, it must be trained on a dataset like COCO or Flickr8k.")
+        print("Use train_captioning.py to train it efficiently from pre-extracted VGG features.")
     except Exception as e:
         print(f"Error building model: {e}")
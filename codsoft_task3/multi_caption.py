@@ -0,0 +1,125 @@
+import argparse
+import json
+import time
+
+import torch
+
+from caption_model import get_model
+from run_captioning import GENERATION_KWARGS, load_image, preprocess
+
+# ==========================================
+# ENCODE ONCE, DECODE MANY
+# ==========================================
+# For several outputs per image (the unconditional caption, prompted captions
+# like "a photograph of", greedy and beam variants), process_image would run
+# the ViT vision encoder again for every output, although its result only
+# depends on the pixels. Here the encoder runs once per image. Every prompt
+# and decoding config then calls text_decoder.generate against the same
+# image embeddings. Prompts with the same token length are decoded together
+# in one batched generate call (per config).
+
+
+def encode_images(images):
+    """Runs the vision encoder once; returns image embeddings (batch, tokens, hidden)."""
+    inputs = preprocess(images)
+    with torch.no_grad():
+        return get_model().model.vision_model(pixel_values=inputs["pixel_values"])[0]
+
+
+def _prompt_ids(prompt):
+    """Decoder input ids for a prompt, prepared the way BlipForConditionalGeneration.generate does."""
+    loaded = get_model()
+    text_config = loaded.model.config.text_config
+    if not prompt:
+        return torch.tensor([[text_config.bos_token_id]])
+    ids = loaded.processor.tokenizer(prompt, return_tensors="pt").input_ids
+    ids[:, 0] = text_config.bos_token_id
+    return ids[:, :-1]  # drop the trailing [SEP] so the decoder continues the prompt
+
+
+def decode_embeddings(image_embeds, prompts=(None,), **generation_kwargs):
+    """Captions every image for every prompt from precomputed embeddings.
+
+    Returns captions[i][j] for image i and prompt j. generation_kwargs override
+    GENERATION_KWARGS. Prompts of equal token length share one generate call.
+    """
+    loaded = get_model()
+    model = loaded.model
+    text_config = model.config.text_config
+    kwargs = {**GENERATION_KWARGS, **generation_kwargs}
+    num_images = image_embeds.shape[0]
+
+    groups = {}
+    for j, prompt in enumerate(prompts):
+        ids = _prompt_ids(prompt)
+        groups.setdefault(ids.shape[1], []).append((j, ids))
+
+    captions = [[None] * len(prompts) for _ in range(num_images)]
+    for members in groups.values():
+        # Rows are prompt-major: prompt k of the group occupies rows k*num_images .. (k+1)*num_images-1
+        input_ids = torch.cat([ids.repeat(num_images, 1) for _, ids in members]).to(image_embeds.device)
+        embeds = image_embeds.repeat(len(members), 1, 1)
+        with torch.no_grad():
+            out = model.text_decoder.generate(
+                input_ids=input_ids,
+                eos_token_id=text_config.sep_token_id,
+                pad_token_id=text_config.pad_token_id,
+                encoder_hidden_states=embeds,
+                encoder_attention_mask=torch.ones(embeds.shape[:-1], dtype=torch.long, device=embeds.device),
+                **kwargs,
+            )
+        texts = loaded.processor.batch_decode(out, skip_special_tokens=True)
+        for k, (j, _) in enumerate(members):
+            for i in range(num_images):
+                captions[i][j] = texts[k * num_images + i]
+    return captions
+
+
+def caption_variants(image_paths, prompts=(None,), configs=({},)):
+    """One dict per image with a caption for every (prompt, config) pair, encoding each image once."""
+    image_embeds = encode_images([load_image(p) for p in image_paths])
+    results = [{"image": path, "captions": []} for path in image_paths]
+    for config in configs:
+        for i, row in enumerate(decode_embeddings(image_embeds, prompts, **config)):
+            for prompt, caption in zip(prompts, row):
+                results[i]["captions"].append({"prompt": prompt, "config": config, "caption": caption})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Several captions per image from one vision-encoder pass.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--prompt", action="append", default=[],
+                        help="conditional prompt, e.g. 'a photograph of' (repeatable; the unprompted caption is always included)")
+    parser.add_argument("--beams", type=int, nargs="+", default=[GENERATION_KWARGS["num_beams"]],
+                        help="one decoding config per beam width, e.g. --beams 1 3")
+    parser.add_argument("--compare", action="store_true", help="also time one full generate() per output")
+    args = parser.parse_args()
+
+    prompts = [None] + args.prompt
+    configs = [{"num_beams": beams} for beams in args.beams]
+
+    start = time.perf_counter()
+    results = caption_variants(args.paths, prompts, configs)
+    shared = time.perf_counter() - start
+    for result in results:
+        print(json.dumps(result))
+
+    outputs = len(args.paths) * len(prompts) * len(configs)
+    print(f"\n{outputs} caption(s) in {shared:.2f}s with one encoder pass per image")
+    if args.compare:
+        images = [load_image(p) for p in args.paths]
+        start = time.perf_counter()
+        for config in configs:
+            for prompt in prompts:
+                loaded = get_model()
+                inputs = preprocess(images)
+                if prompt:
+                    inputs["input_ids"] = loaded.processor.tokenizer([prompt] * len(images), return_tensors="pt").input_ids.to(loaded.device)
+                with torch.no_grad():
+                    loaded.model.generate(**inputs, **{**GENERATION_KWARGS, **config})
+        print(f"{outputs} caption(s) in {time.perf_counter() - start:.2f}s re-encoding for every output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# ==========================================
+# PREFETCHING DECODE / RESIZE PIPELINE
+# ==========================================
+# Decoding a 12 MP JPEG takes longer than captioning it on a fast GPU, so the
+# model should never wait on it. PrefetchLoader decodes a batch on a thread
+# pool (PIL releases the GIL while decoding and resizing), tensorizes it and
+# puts it on a bounded queue while the model is still busy with the previous
+# batch. JPEGs are decoded with draft(), which lets libjpeg skip straight to a
+# 1/2, 1/4 or 1/8 scale image that is still at least the model input size.
+
+BLIP_SIZE = 384
+_DONE = object()
+
+
+def fast_load(path, size=BLIP_SIZE):
+    """Opens an image as RGB, no larger than size x size (aspect ratio kept)."""
+    img = Image.open(path)
+    if img.format == "JPEG":
+        img.draft("RGB", (size, size))
+    img = img.convert("RGB")
+    img.thumbnail((size, size))
+    return img
+
+
+class StageTimings:
+    """Thread-safe running totals of seconds spent per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {}
+        self.items = {}
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.items[stage] = self.items.get(stage, 0) + items
+
+    def report(self):
+        with self._lock:
+            return {stage: {"total_s": round(total, 3),
+                            "per_item_ms": round(1000 * total / max(self.items[stage], 1), 2)}
+                    for stage, total in self.seconds.items()}
+
+    def format(self):
+        lines = [f"{'stage':<10} | {'total s':>8} | {'ms/item':>8}"]
+        for stage, row in self.report().items():
+            lines.append(f"{stage:<10} | {row['total_s']:>8.2f} | {row['per_item_ms']:>8.2f}")
+        return "\n".join(lines)
+
+
+class PrefetchLoader:
+    """Iterates over (paths, inputs, errors) batches prepared ahead of the consumer.
+
+    `tensorize(images)` turns a list of PIL images into model inputs; it runs on
+    the loader's thread. `errors` is a list of (path, message) for images that
+    could not be read, and `inputs` is None if the whole batch failed.
+    Decode time is summed over workers, so it can exceed wall time.
+    """
+
+    def __init__(self, image_paths, tensorize, batch_size=8, workers=4, prefetch_batches=2,
+                 load_fn=fast_load, timings=None):
+        self.image_paths = list(image_paths)
+        self.tensorize = tensorize
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch_batches = prefetch_batches
+        self.load_fn = load_fn
+        self.timings = timings if timings is not None else StageTimings()
+
+    def __iter__(self):
+        batches = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(batches, stop), daemon=True, name="prefetch")
+        producer.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = batches.get()
+                # Time the consumer spent starved: ideally ~0 after the first batch
+                self.timings.add("wait", time.perf_counter() - start)
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    @staticmethod
+    def _put(batches, item, stop):
+        """Blocks while the queue is full; gives up if the consumer has gone away."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _load(self, path):
+        start = time.perf_counter()
+        try:
+            return path, self.load_fn(path), None
+        except Exception as e:
+            return path, None, str(e)
+        finally:
+            self.timings.add("decode", time.perf_counter() - start)
+
+    def _produce(self, batches, stop):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decode") as pool:
+                for start in range(0, len(self.image_paths), self.batch_size):
+                    if stop.is_set():
+                        return
+                    loaded = list(pool.map(self._load, self.image_paths[start:start + self.batch_size]))
+                    paths = [path for path, img, _ in loaded if img is not None]
+                    images = [img for _, img, _ in loaded if img is not None]
+                    errors = [(path, error) for path, img, error in loaded if img is None]
+
+                    inputs = None
+                    if images:
+                        tensorize_start = time.perf_counter()
+                        inputs = self.tensorize(images)
+                        self.timings.add("tensorize", time.perf_counter() - tensorize_start, len(images))
+                    if not self._put(batches, (paths, inputs, errors), stop):
+                        return
+        except Exception as e:
+            self._put(batches, e, stop)
+        finally:
+            self._put(batches, _DONE, stop)
@@ -1,58 +1,196 @@
-from transformers import BlipProcessor, BlipForConditionalGeneration
 import torch
-from PIL import Image
 import os
 import time
+
+from caption_cache import CaptionCache, settings_namespace
+from caption_model import (BACKENDS, backend_placement, get_model, model_fingerprint, set_allow_download,
+                           set_default_backend)
+from prefetch_loader import PrefetchLoader, StageTimings, fast_load
 # ==========================================
 # ULTIMATE FAST VERSION (FP16 Optimized)
 # ==========================================
+# The model is loaded on first use by caption_model.get_model(), so importing
+# this module is cheap.
+
+# Added repetition_penalty and no_repeat_ngram_size to stop text looping
+GENERATION_KWARGS = dict(
+    max_new_tokens=30,
+    num_beams=3,
+    repetition_penalty=1.2,
+    no_repeat_ngram_size=2
+)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
 
-print("--- Initializing AI (Optimized Load) ---")
-start_time = time.time()
+# Shared by every call in this process; set CAPTION_CACHE_DB for a tier shared across processes and runs
+caption_cache = CaptionCache(db_path=os.environ.get("CAPTION_CACHE_DB"))
 
-# 1. Detect Hardware and set precision
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-# Use float16 on GPU (it's 2x faster and uses half the memory)
-# On CPU, we stay with float32 for stability
-dtype = torch.float16 if device.type == 'cuda' else torch.float32
+def cache_namespace():
+    """Changes whenever the model snapshot, backend, device/dtype or decoding settings change."""
+    backend, device, dtype = backend_placement()
+    return settings_namespace(model_fingerprint(), backend, GENERATION_KWARGS, str(device), str(dtype))
 
-# 2. Load model with optimizations
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained(
-    "Salesforce/blip-image-captioning-base", 
-    torch_dtype=dtype
-).to(device)
+def load_image(image_path):
+    # Decode JPEGs at reduced size (draft mode) and resize for much faster processing
+    return fast_load(image_path, 384) # BLIP default size is 384
 
-# 3. Optimize for inference
-model.eval()
+def preprocess(images):
+    """Tensorizes a list of PIL images for the model."""
+    # The processor resizes every image to 384x384, so they stack into one tensor
+    loaded = get_model()
+    return loaded.processor(images=images, return_tensors="pt").to(loaded.device, loaded.dtype)
 
-print(f"AI Ready! (Load time: {time.time() - start_time:.2f}s | Device: {device} | Precision: {dtype})")
+def generate_captions(inputs):
+    loaded = get_model()
+    with torch.no_grad():
+        out = loaded.model.generate(**inputs, **GENERATION_KWARGS)
+    return loaded.processor.batch_decode(out, skip_special_tokens=True)
 
-def process_image(image_path):
+def caption_batch(images):
+    """Captions a list of PIL images with a single batched generate call."""
+    return generate_captions(preprocess(images))
+
+def process_image(image_path, use_cache=True):
     try:
-        # Resize image for much faster processing
-        img = Image.open(image_path).convert('RGB')
-        img.thumbnail((384, 384)) # BLIP default size is 384
-        
-        inputs = processor(img, return_tensors="pt").to(device, dtype)
-
-        with torch.no_grad():
-            # Added repetition_penalty and no_repeat_ngram_size to stop text looping
-            out = model.generate(
-                **inputs, 
-                max_new_tokens=30, 
-                num_beams=3, 
-                repetition_penalty=1.2,
-                no_repeat_ngram_size=2
-            )
-            caption = processor.decode(out[0], skip_special_tokens=True)
+        key = None
+        if use_cache:
+            key = caption_cache.key(caption_cache.file_key(image_path), cache_namespace())
+            caption = caption_cache.get(key)
+            if caption is not None:
+                return caption
+        caption = caption_batch([load_image(image_path)])[0]
+        if key:
+            caption_cache.put(key, caption)
         return caption
     except Exception as e:
         return f"Error: {e}"
 
+def list_images(inputs):
+    """Expands directories in `inputs` to the image files they contain."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(os.path.join(item, f) for f in os.listdir(item) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(item)
+    return paths
+
+def caption_images(image_paths, batch_size=8, workers=4, timings=None, use_cache=True):
+    """Yields one result dict per image, a batch at a time, as soon as each batch is done.
+
+    Cached captions are yielded first (marked "cached": true); only the rest
+    reach the model. The next batches are decoded and tensorized on background
+    threads while the model works. Pass a StageTimings to collect
+    decode/tensorize/wait/inference totals.
+    """
+    keys, pending = {}, []
+    namespace = cache_namespace() if use_cache else None
+    for path in image_paths:
+        if namespace:
+            try:
+                keys[path] = caption_cache.key(caption_cache.file_key(path), namespace)
+            except OSError:
+                pass  # unreadable: the loader reports the error
+            else:
+                caption = caption_cache.get(keys[path])
+                if caption is not None:
+                    yield {"image": path, "caption": caption, "cached": True}
+                    continue
+        pending.append(path)
+
+    loader = PrefetchLoader(pending, preprocess, batch_size, workers, load_fn=load_image, timings=timings)
+    for paths, inputs, errors in loader:
+        for path, error in errors:
+            yield {"image": path, "error": error}
+        if inputs is None:
+            continue
+        batch_start = time.perf_counter()
+        captions = generate_captions(inputs)
+        seconds = time.perf_counter() - batch_start
+        loader.timings.add("inference", seconds, len(paths))
+        for path, caption in zip(paths, captions):
+            if path in keys:
+                caption_cache.put(keys[path], caption)
+            yield {"image": path, "caption": caption, "batch_size": len(paths), "batch_seconds": round(seconds, 3)}
+
+def load_model(warmup=False):
+    """Loads (or returns) the shared model and prints how long startup took."""
+    print("--- Initializing AI (Optimized Load) ---")
+    loaded = get_model()
+    print(f"AI Ready! (Load time: {loaded.load_seconds:.2f}s | Backend: {loaded.backend} | "
+          f"Device: {loaded.device} | Precision: {loaded.dtype})")
+    if warmup:
+        get_model(warmup=True)
+        print(f"Warm-up: {loaded.warmup_seconds:.2f}s")
+    return loaded
+
+def run_batch_mode(inputs, batch_size, output_path=None, workers=4, use_cache=True):
+    """Captions every image in `inputs`, writing one JSON line per image."""
+    import json
+    import sys
+
+    image_paths = list_images(inputs)
+    print(f"Captioning {len(image_paths)} image(s) in batches of {batch_size}...", file=sys.stderr)
+    out = open(output_path, "a", encoding="utf-8") if output_path else sys.stdout
+    start = time.time()
+    timings = StageTimings()
+    try:
+        for record in caption_images(image_paths, batch_size, workers, timings, use_cache):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if output_path:
+            out.close()
+    elapsed = time.time() - start
+    print(f"Done in {elapsed:.2f}s ({len(image_paths) / elapsed:.2f} images/s)", file=sys.stderr)
+    print(timings.format(), file=sys.stderr)
+    if use_cache:
+        print(f"Caption cache: {caption_cache.stats()}", file=sys.stderr)
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="BLIP image captioning (interactive, or batch mode with paths).")
+    parser.add_argument("inputs", nargs="*", help="image files or directories (omit for interactive mode)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="append JSONL results here instead of printing them")
+    parser.add_argument("--workers", type=int, default=4, help="image decoding threads")
+    parser.add_argument("--backend", choices=BACKENDS, help="inference backend (default: $BLIP_BACKEND or eager)")
+    parser.add_argument("--cache-db", default=os.environ.get("CAPTION_CACHE_DB"),
+                        help="SQLite file for the persistent caption cache (default: $CAPTION_CACHE_DB, memory only)")
+    parser.add_argument("--no-cache", action="store_true", help="always run the model")
+    parser.add_argument("--prune-cache", action="store_true",
+                        help="delete cached captions made with a different model or decoding settings")
+    parser.add_argument("--stream", action="store_true",
+                        help="interactive mode: print captions word by word (greedy decoding)")
+    parser.add_argument("--max-time", type=float, help="interactive mode: stop generating after this many seconds")
+    parser.add_argument("--warmup", action="store_true", help="run a dummy caption right after loading")
+    parser.add_argument("--download", action="store_true",
+                        help="download the model if it is not on disk yet (default: local files only)")
+    parser.add_argument("--save-snapshot", metavar="DIR",
+                        help="save a local safetensors snapshot to DIR (then set BLIP_MODEL_DIR=DIR) and exit")
+    args = parser.parse_args()
+
+    if args.download:
+        set_allow_download()
+    if args.save_snapshot:
+        from caption_model import export_snapshot
+        print(f"Snapshot saved to {export_snapshot(args.save_snapshot)}")
+        raise SystemExit(0)
+
+    if args.backend:
+        set_default_backend(args.backend)
+    caption_cache = CaptionCache(db_path=args.cache_db)
+    if args.prune_cache:
+        print(f"Pruned {caption_cache.prune_stale(cache_namespace())} stale cached caption(s)")
+    load_model(args.warmup)
+
+    if args.inputs:
+        run_batch_mode(args.inputs, args.batch_size, args.output, args.workers, not args.no_cache)
+        raise SystemExit(0)
+
     print("\n--- Instant Captioning Mode ---")
-    
+    first = True
+
     while True:
         image_path = input("\nEnter image path (or 'q' to quit): ").strip()
         
@@ -68,10 +206,21 @@ if __name__ == "__main__":
         if os.path.exists(image_path):
             print("Processing...")
             inf_start = time.time()
-            caption = process_image(image_path)
-            print("-" * 50)
-            print(f"RESULT: {caption}")
-            print(f"Speed: {time.time() - inf_start:.3f} seconds")
+            if args.stream or args.max_time:
+                from stream_caption import stream_caption
+                num_beams = 1 if args.stream else GENERATION_KWARGS["num_beams"]
+                print("RESULT: ", end="", flush=True)
+                stream = stream_caption(image_path, args.max_time, num_beams,
+                                        on_text=lambda text: print(text, end="", flush=True))
+                print(" (stopped at the time budget)" if stream.stopped_early else "")
+                print("-" * 50)
+                print(f"First token: {stream.ttft:.3f} seconds")
+            else:
+                caption = process_image(image_path, use_cache=not args.no_cache)
+                print("-" * 50)
+                print(f"RESULT: {caption}")
+            print(f"Speed: {time.time() - inf_start:.3f} seconds" + (" (first inference)" if first else ""))
+            first = False
             print("-" * 50)
         else:
             print("Error: File not found.")
@@ -0,0 +1,116 @@
+import argparse
+import threading
+import time
+
+import torch
+
+from caption_model import get_model
+from run_captioning import GENERATION_KWARGS, load_image, preprocess
+
+# ==========================================
+# STREAMING CAPTIONS WITH A LATENCY BUDGET
+# ==========================================
+# process_image only returns once beam search has finished the whole caption.
+# CaptionStream runs generate() on a background thread with a
+# TextIteratorStreamer and yields the caption word by word as it is produced.
+# With max_time set, generation stops at the deadline (generate's
+# MaxTimeCriteria) and the caption so far is returned. Time to first token
+# and total latency are recorded on the stream.
+#
+# Hugging Face streamers only work with greedy decoding. With num_beams > 1
+# nothing can be streamed, so the whole caption arrives as one piece at the
+# end; the latency budget still applies.
+
+
+class CaptionStream:
+    """Iterate to get caption text pieces; afterwards .caption, .ttft, .total and .stopped_early are set."""
+
+    def __init__(self, image, max_time=None, num_beams=1, **generation_kwargs):
+        self.image = image
+        self.max_time = max_time
+        self.generation_kwargs = {**GENERATION_KWARGS, "num_beams": num_beams, **generation_kwargs}
+        self.caption = ""
+        self.ttft = None
+        self.total = None
+        self.stopped_early = False
+
+    def __iter__(self):
+        from transformers import TextIteratorStreamer
+
+        loaded = get_model()
+        start = time.perf_counter()
+        image = load_image(self.image) if isinstance(self.image, str) else self.image
+        inputs = preprocess([image])
+        kwargs = dict(self.generation_kwargs)
+        if self.max_time is not None:
+            # The budget covers the whole call, so take off what image loading already used
+            kwargs["max_time"] = max(self.max_time - (time.perf_counter() - start), 0.01)
+
+        streamer = None
+        if kwargs["num_beams"] == 1:
+            streamer = TextIteratorStreamer(loaded.processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            kwargs["streamer"] = streamer
+
+        result = {}
+
+        def run():
+            try:
+                with torch.no_grad():
+                    result["ids"] = loaded.model.generate(**inputs, **kwargs)
+            except Exception as e:
+                result["error"] = e
+                if streamer is not None:
+                    streamer.end()  # unblock the consumer
+
+        worker = threading.Thread(target=run, daemon=True, name="caption-stream")
+        worker.start()
+        if streamer is not None:
+            for piece in streamer:
+                if not piece:
+                    continue
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - start
+                yield piece
+        worker.join()
+        if "error" in result:
+            raise result["error"]
+
+        ids = result["ids"][0]
+        self.caption = loaded.processor.decode(ids, skip_special_tokens=True).strip()
+        if streamer is None:
+            self.ttft = time.perf_counter() - start
+            yield self.caption
+        self.total = time.perf_counter() - start
+        if self.ttft is None:
+            self.ttft = self.total  # nothing was generated
+        text_config = loaded.model.config.text_config
+        self.stopped_early = (self.max_time is not None and int(ids[-1]) != text_config.sep_token_id
+                              and self.total >= self.max_time)
+
+
+def stream_caption(image, max_time=None, num_beams=1, on_text=None):
+    """Captions one image, calling on_text(piece) as text arrives; returns the finished CaptionStream."""
+    stream = CaptionStream(image, max_time=max_time, num_beams=num_beams)
+    for piece in stream:
+        if on_text is not None:
+            on_text(piece)
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a caption word by word, optionally under a time budget.")
+    parser.add_argument("path", nargs="?", default="sample_image.jpg")
+    parser.add_argument("--max-time", type=float, help="stop generating after this many seconds")
+    parser.add_argument("--beams", type=int, default=1, help="1 streams tokens; more only applies the budget")
+    args = parser.parse_args()
+
+    get_model(warmup=True)
+    stream = stream_caption(args.path, args.max_time, args.beams, on_text=lambda t: print(t, end="", flush=True))
+    print()
+    print("-" * 50)
+    print(f"RESULT: {stream.caption}" + (" (stopped at the time budget)" if stream.stopped_early else ""))
+    print(f"First token: {stream.ttft:.3f}s | Total: {stream.total:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+from model_definition import ImageCaptioningModel
+
+# ==========================================
+# TRAINING PIPELINE FOR ImageCaptioningModel
+# ==========================================
+# VGG16 is frozen, so its output for an image never changes, yet forward()
+# would recompute all 13 conv layers for every caption in every epoch.
+# Training is therefore split in two steps:
+#   1. extract   run VGG16 once per image and write the flattened (25088)
+#                features as float16 to a memory-mapped .npy store
+#   2. train     train fc_image / embedding / lstm / fc_out from the store,
+#                with length-bucketed padded batches, a multi-worker
+#                DataLoader and mixed precision
+#
+# Captions file: Flickr8k "captions.txt" (image,caption per line) or the
+# original "Flickr8k.token.txt" (image#n<TAB>caption).
+
+PAD, START, END, UNK = "<pad>", "<start>", "<end>", "<unk>"
+FEATURE_SIZE = 512 * 7 * 7
+STORE_VERSION = 1
+
+
+# --- captions and vocabulary ---
+
+def tokenize(text):
+    return re.findall(r"[a-z]+", text.lower())
+
+
+def read_captions(path):
+    """Returns {image file name: [caption, ...]}."""
+    captions = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.lower().startswith("image,caption"):
+                continue
+            if "\t" in line:
+                image, caption = line.split("\t", 1)
+                image = image.split("#", 1)[0]
+            else:
+                image, caption = line.split(",", 1)
+            captions.setdefault(image.strip(), []).append(caption.strip())
+    return captions
+
+
+def build_vocab(captions, vocab_size=10000, min_count=1):
+    counts = Counter(word for caps in captions.values() for c in caps for word in tokenize(c))
+    words = [w for w, n in counts.most_common(vocab_size - 4) if n >= min_count]
+    return [PAD, START, END, UNK] + words
+
+
+def encode_caption(caption, word_index, max_length=35):
+    unk = word_index[UNK]
+    ids = [word_index.get(w, unk) for w in tokenize(caption)][:max_length - 2]
+    return [word_index[START]] + ids + [word_index[END]]
+
+
+# --- step 1: feature extraction ---
+
+class ImageFolderDataset(Dataset):
+    def __init__(self, image_paths):
+        from torchvision import transforms
+
+        self.image_paths = image_paths
+        self.transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ])
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, index):
+        from PIL import Image
+
+        with Image.open(self.image_paths[index]) as img:
+            return self.transform(img.convert("RGB"))
+
+
+def extract_features(model, image_dir, image_names, store_dir, batch_size=64, workers=4, device=torch.device("cpu")):
+    """Writes features.npy (N x 25088 float16, row i = image_names[i]) and index.json to store_dir.
+
+    Skipped when the store already holds exactly these images.
+    """
+    index_path = os.path.join(store_dir, "index.json")
+    features_path = os.path.join(store_dir, "features.npy")
+    if os.path.exists(index_path) and os.path.exists(features_path):
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == STORE_VERSION and index.get("images") == image_names:
+            print(f"Feature store up to date ({len(image_names)} images), skipping extraction.")
+            return
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = features_path + ".tmp.npy"
+    features = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16,
+                                         shape=(len(image_names), FEATURE_SIZE))
+    loader = DataLoader(ImageFolderDataset([os.path.join(image_dir, n) for n in image_names]),
+                        batch_size=batch_size, num_workers=workers, pin_memory=device.type == "cuda")
+
+    vgg = model.vgg.to(device).eval()
+    start, row = time.time(), 0
+    with torch.no_grad(), torch.autocast("cuda", enabled=device.type == "cuda"):
+        for images in loader:
+            batch = vgg(images.to(device, non_blocking=True)).flatten(1)
+            features[row:row + len(batch)] = batch.float().cpu().numpy()
+            row += len(batch)
+            print(f"\rExtracted {row}/{len(image_names)} images ({row / (time.time() - start):.1f}/s)", end="")
+    print()
+    features.flush()
+    del features
+    os.replace(tmp_path, features_path)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "images": image_names}, f)
+
+
+# --- step 2: training from the store ---
+
+class FeatureCaptionDataset(Dataset):
+    """(feature row, caption ids) pairs; one sample per caption."""
+
+    def __init__(self, features_path, samples):
+        self.features_path = features_path
+        self.samples = samples  # [(image row, [ids...]), ...]
+        self.features = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        # Opened lazily so each DataLoader worker maps the file itself instead of pickling it
+        if self.features is None:
+            self.features = np.load(self.features_path, mmap_mode="r")
+        row, ids = self.samples[index]
+        return torch.from_numpy(self.features[row].astype(np.float32)), torch.tensor(ids, dtype=torch.long)
+
+
+class BucketBatchSampler(Sampler):
+    """Batches of captions with similar lengths, so padding stays minimal; batch order is shuffled."""
+
+    def __init__(self, lengths, batch_size, shuffle=True, seed=0):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = random.Random(seed)
+
+    def _batches(self):
+        order = list(range(len(self.lengths)))
+        if self.shuffle:
+            self.rng.shuffle(order)  # random tie-break inside each length
+        order.sort(key=lambda i: self.lengths[i])
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        if self.shuffle:
+            self.rng.shuffle(batches)
+        return batches
+
+    def __iter__(self):
+        return iter(self._batches())
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def pad_collate(batch):
+    features, captions = zip(*batch)
+    padded = nn.utils.rnn.pad_sequence(captions, batch_first=True, padding_value=0)  # <pad> is id 0
+    return torch.stack(features), padded
+
+
+def train(model, loader, epochs, lr, device, checkpoint_path, vocab):
+    model.vgg.requires_grad_(False)
+    model.vgg.cpu()  # not used while training from the feature store
+    for name in ("fc_image", "dropout_img", "embedding", "dropout_text", "lstm", "fc_out"):
+        getattr(model, name).to(device)
+    params = [p for p in model.parameters() if p.requires_grad]
+    optimizer = torch.optim.Adam(params, lr=lr)
+    criterion = nn.CrossEntropyLoss(ignore_index=0)
+    use_amp = device.type == "cuda"  # fp16 autocast + loss scaling; on CPU training stays fp32
+    scaler = torch.cuda.amp.GradScaler(enabled=use_amp)
+
+    for epoch in range(1, epochs + 1):
+        model.train()
+        start, total_loss, steps = time.time(), 0.0, 0
+        for features, captions in loader:
+            features = features.to(device, non_blocking=True)
+            captions = captions.to(device, non_blocking=True)
+            optimizer.zero_grad(set_to_none=True)
+            with torch.autocast("cuda", dtype=torch.float16, enabled=use_amp):
+                # Inputs: [image, <start>, w1..wn]; outputs after each word predict the next one
+                outputs = model.forward_features(features, captions[:, :-1])
+                loss = criterion(outputs[:, 1:].reshape(-1, outputs.size(-1)).float(), captions[:, 1:].reshape(-1))
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+            total_loss += loss.item()
+            steps += 1
+        print(f"Epoch {epoch}/{epochs} | loss {total_loss / max(steps, 1):.4f} | {time.time() - start:.1f}s")
+
+        trainable = {k: v for k, v in model.state_dict().items() if not k.startswith("vgg.")}
+        torch.save({"state_dict": trainable, "vocab": vocab, "epoch": epoch}, checkpoint_path)
+    print(f"Checkpoint saved to {checkpoint_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train ImageCaptioningModel from pre-extracted VGG16 features.")
+    parser.add_argument("--images", required=True, help="folder with the dataset images")
+    parser.add_argument("--captions", required=True, help="captions.txt or Flickr8k.token.txt")
+    parser.add_argument("--store", default="features", help="feature store directory")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--workers", type=int, default=4, help="DataLoader worker processes")
+    parser.add_argument("--vocab-size", type=int, default=10000)
+    parser.add_argument("--max-length", type=int, default=35)
+    parser.add_argument("--checkpoint", default="caption_lstm.pt")
+    parser.add_argument("--extract-only", action="store_true")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    captions = read_captions(args.captions)
+    image_names = sorted(n for n in captions if os.path.exists(os.path.join(args.images, n)))
+    print(f"{len(image_names)} images, {sum(len(captions[n]) for n in image_names)} captions")
+
+    vocab = build_vocab({n: captions[n] for n in image_names}, args.vocab_size)
+    model = ImageCaptioningModel(vocab_size=len(vocab), max_length=args.max_length)
+    extract_features(model, args.images, image_names, args.store, workers=args.workers, device=device)
+    if args.extract_only:
+        return
+
+    word_index = {w: i for i, w in enumerate(vocab)}
+    samples = [(row, encode_caption(c, word_index, args.max_length))
+               for row, name in enumerate(image_names) for c in captions[name]]
+    dataset = FeatureCaptionDataset(os.path.join(args.store, "features.npy"), samples)
+    loader = DataLoader(
+        dataset,
+        batch_sampler=BucketBatchSampler([len(ids) for _, ids in samples], args.batch_size),
+        collate_fn=pad_collate,
+        num_workers=args.workers,
+        pin_memory=device.type == "cuda",
+        persistent_workers=args.workers > 0,
+    )
+    train(model, loader, args.epochs, args.lr, device, args.checkpoint, vocab)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# -----------------------------------------
+# BATCH "SIMILAR TITLES" GENERATION
+# -----------------------------------------
+# Computes the top-k similar items for thousands of query titles (default:
+# the whole catalogue) in one run. Queries are processed in blocks: one
+# CSR x dense product gives a dense block of similarities, argpartition
+# reduces it to k ids + scores, and the block is written out straight away.
+# Blocks run in a process pool, and only a bounded number are in flight at
+# once, so memory does not grow with the number of queries.
+#
+# Output: .npy   -> <name>_ids.npy, <name>_scores.npy, <name>_queries.npy (Q x k, Q x k, Q)
+#         .parquet -> one row per query: query_row, query_title, neighbour_ids, scores
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from movie_recommender import MovieRecommender
+from recommender_engine import iter_top_k
+
+
+class NpyWriter:
+    def __init__(self, path, query_rows, k):
+        stem = os.path.splitext(path)[0]
+        self.ids = np.lib.format.open_memmap(f"{stem}_ids.npy", mode="w+", dtype=np.int32, shape=(len(query_rows), k))
+        self.scores = np.lib.format.open_memmap(f"{stem}_scores.npy", mode="w+", dtype=np.float32,
+                                                shape=(len(query_rows), k))
+        np.save(f"{stem}_queries.npy", np.asarray(query_rows, dtype=np.int64))
+
+    def write(self, offset, query_rows, ids, scores):
+        self.ids[offset:offset + len(ids)] = ids
+        self.scores[offset:offset + len(ids)] = scores
+
+    def close(self):
+        self.ids.flush()
+        self.scores.flush()
+
+
+class ParquetWriter:
+    def __init__(self, path, titles, k):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.titles = titles
+        self.k = k
+        self.schema = pa.schema([
+            ("query_row", pa.int64()),
+            ("query_title", pa.string()),
+            ("neighbour_ids", pa.list_(pa.int32(), k)),
+            ("scores", pa.list_(pa.float32(), k)),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, offset, query_rows, ids, scores):
+        pa = self.pa
+        table = pa.Table.from_arrays([
+            pa.array(query_rows, pa.int64()),
+            pa.array(self.titles[query_rows].tolist(), pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(ids.ravel(), pa.int32()), self.k),
+            pa.FixedSizeListArray.from_arrays(pa.array(scores.ravel(), pa.float32()), self.k),
+        ], schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def batch_recommend(recommender, query_rows, output_path, k=10, workers=1, max_block_bytes=256 * 2**20,
+                    progress=False):
+    """Writes the top-k neighbours of every query row to output_path (.npy or .parquet); returns seconds.
+
+    With fewer than two items there are no neighbours (k = 0): the output is
+    written with its schema but no neighbour data. progress=True reports the
+    query count on stderr after every block.
+    """
+    query_rows = np.asarray(query_rows, dtype=np.int64)
+    k = min(k, max(len(recommender) - 1, 0))
+    if output_path.endswith(".parquet"):
+        writer = ParquetWriter(output_path, recommender.titles, k)
+    else:
+        writer = NpyWriter(output_path, query_rows, k)
+
+    start = time.perf_counter()
+    done = 0
+    try:
+        if k == 0:
+            return time.perf_counter() - start
+        for offset, ids, scores in iter_top_k(recommender.engine.matrix, query_rows, k, max_block_bytes, workers):
+            writer.write(offset, query_rows[offset:offset + len(ids)], ids, scores)
+            done += len(ids)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{len(query_rows)} queries ({done / elapsed:.0f}/s)", end="", file=sys.stderr,
+                      flush=True)
+    finally:
+        writer.close()
+        if progress and done:
+            print(file=sys.stderr)
+    return time.perf_counter() - start
+
+
+def load_catalogue(args):
+    if args.synthetic:
+        from benchmark_recommender import synthetic_catalogue
+        return synthetic_catalogue(args.synthetic)
+    import pandas as pd
+    catalogue = pd.read_csv(args.catalogue)
+    return catalogue[args.title_col].astype(str).tolist(), catalogue[args.text_col].fillna("").astype(str).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-k similar titles for many queries, written to .npy or .parquet.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--catalogue", help="CSV file with a title and a text (genre/description) column")
+    source.add_argument("--synthetic", type=int, metavar="N", help="use a synthetic catalogue of N items")
+    parser.add_argument("--title-col", default="title")
+    parser.add_argument("--text-col", default="genre")
+    parser.add_argument("--queries", help="text file with one query title per line (default: every item)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--block-mb", type=int, default=256, help="max working memory of one block per worker (MB)")
+    parser.add_argument("--output", default="similar_titles.npy", help="*.npy or *.parquet")
+    args = parser.parse_args()
+
+    titles, descriptions = load_catalogue(args)
+    start = time.perf_counter()
+    recommender = MovieRecommender(titles, descriptions, k=args.k, precompute=False)
+    print(f"Fitted TF-IDF on {len(recommender)} items in {time.perf_counter() - start:.1f}s")
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            rows = recommender.find_many(line.strip() for line in f if line.strip())
+        if (rows < 0).any():
+            print(f"{int((rows < 0).sum())} query title(s) not found, skipping them")
+        rows = rows[rows >= 0]
+    else:
+        rows = np.arange(len(recommender))
+
+    seconds = batch_recommend(recommender, rows, args.output, args.k, args.workers, args.block_mb * 2**20,
+                              progress=True)
+    print(f"{len(rows)} queries in {seconds:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -----------------------------------------
+# RECOMMENDER QPS BENCHMARK
+# -----------------------------------------
+# Builds synthetic catalogues of increasing size (titles + 4-8 genre/keyword
+# words from a Zipf-like vocabulary) and measures build time and queries per
+# second for:
+#   legacy    dense cosine_similarity + DataFrame scans + sorted() (original code)
+#   prepared  MovieRecommender: title hash index + precomputed top-k neighbours
+#   typo      MovieRecommender with one character of every query changed, so
+#             each lookup goes through the fuzzy (trigram + difflib) fallback
+# The legacy path needs 8 * N^2 bytes, so it only runs up to --legacy-max items.
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from movie_recommender import MovieRecommender
+
+
+def synthetic_catalogue(n, vocab_size=300, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"tag{i}" for i in range(vocab_size)])
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    titles = [f"Movie {i:07d}" for i in range(n)]
+    descriptions = [" ".join(rng.choice(words, size=rng.integers(4, 9), replace=False, p=weights)) for _ in range(n)]
+    return titles, descriptions
+
+
+def typo(title, rng):
+    """Replaces, deletes or swaps one character of a title."""
+    i = int(rng.integers(1, len(title) - 1))
+    kind = rng.integers(3)
+    if kind == 0:
+        return title[:i] + "x" + title[i + 1:]
+    if kind == 1:
+        return title[:i] + title[i + 1:]
+    return title[:i - 1] + title[i] + title[i - 1] + title[i + 1:]
+
+
+def legacy_build(titles, descriptions):
+    movies = pd.DataFrame({"title": titles, "genre": descriptions})
+    movies["title_lower"] = movies["title"].str.lower()
+    tfidf_matrix = TfidfVectorizer().fit_transform(movies["genre"])
+    return movies, cosine_similarity(tfidf_matrix, tfidf_matrix)
+
+
+def legacy_recommend(movies, cosine_sim, movie_name):
+    """The original recommend_movie, verbatim apart from taking its globals as arguments."""
+    movie_name = movie_name.lower()
+    if movie_name not in movies['title_lower'].values:
+        return "Movie not found in database."
+    index = movies[movies['title_lower'] == movie_name].index[0]
+    similarity_scores = list(enumerate(cosine_sim[index]))
+    similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
+    return [movies.iloc[i[0]]['title'] for i in similarity_scores[1:4]]
+
+
+def measure_qps(fn, queries, max_seconds):
+    start = time.perf_counter()
+    done = 0
+    for query in queries:
+        fn(query)
+        done += 1
+        if time.perf_counter() - start > max_seconds:
+            break
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queries/second of the recommender vs. catalogue size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="largest size to run the dense legacy path on")
+    parser.add_argument("--seconds", type=float, default=5.0, help="time limit per measurement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'items':>8} | {'legacy build s':>14} | {'legacy QPS':>10} | {'prepared build s':>16} | {'prepared QPS':>12} | "
+          f"{'typo QPS':>8}")
+    print("-" * 85)
+    for n in args.sizes:
+        titles, descriptions = synthetic_catalogue(n)
+        queries = [titles[i].upper() for i in rng.integers(0, n, args.queries)]
+        typo_queries = [typo(query, rng) for query in queries]
+
+        legacy_build_s = legacy_qps = None
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            movies, cosine_sim = legacy_build(titles, descriptions)
+            legacy_build_s = time.perf_counter() - start
+            legacy_qps = measure_qps(lambda q: legacy_recommend(movies, cosine_sim, q), queries, args.seconds)
+            del movies, cosine_sim
+
+        start = time.perf_counter()
+        recommender = MovieRecommender(titles, descriptions, k=10)
+        build_s = time.perf_counter() - start
+        qps = measure_qps(lambda q: recommender.recommend(q, k=3), queries, args.seconds)
+        recommender.find("x")  # builds the fuzzy index once, outside the timing
+        typo_qps = measure_qps(lambda q: recommender.recommend(q, k=3), typo_queries, args.seconds)
+
+        legacy_cols = (f"{legacy_build_s:>14.2f} | {legacy_qps:>10.0f}" if legacy_qps is not None
+                       else f"{'skipped':>14} | {'-':>10}")
+        print(f"{n:>8} | {legacy_cols} | {build_s:>16.2f} | {qps:>12.0f} | {typo_qps:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# -----------------------------------------
+# INCREMENTAL RECOMMENDER INDEX
+# -----------------------------------------
+# Adding one movie used to mean refitting TfidfVectorizer on everything and
+# recomputing every similarity. IncrementalIndex keeps the TF-IDF statistics
+# itself (same maths as TfidfVectorizer's defaults: token pattern
+# (?u)\b\w\w+\b on lowercased text, raw counts, smooth idf
+# ln((1 + n) / (1 + df)) + 1, L2-normalized rows) and supports add / update /
+# remove:
+#   - document frequencies and n are updated exactly on every change
+#   - a new item is vectorized with the current idf and compared with every
+#     item once (one sparse mat-vec): that gives its own top-k list, and it is
+#     inserted into the lists of items it beats the k-th neighbour of
+#   - a removed item is dropped from the lists that contained it; only those
+#     lists are recomputed, in blocks sized by block_size()
+# New vectors go into a small tail matrix; it is merged into the big base
+# matrix once it reaches MERGE_ROWS rows (or when remove()/save() need the
+# whole matrix), so a run of adds doesn't copy the base every time.
+# Existing vectors keep the idf they were made with until compact(), which
+# refits everything exactly. compact() runs by itself once the number of
+# changes passes compact_ratio * (number of items).
+# save()/load() persist the whole index, so a restart doesn't rebuild it.
+# save() writes a complete copy next to the target and swaps directories,
+# like build_store().
+
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from recommender_engine import block_size, build_neighbours, top_k
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+INDEX_VERSION = 1
+MERGE_ROWS = 1024
+
+
+def analyze(text):
+    return Counter(TOKEN_PATTERN.findall(str(text).lower()))
+
+
+def _json_key(key):
+    """Item key as stored in items.json: numpy scalars become Python ones; only str/int keys round-trip."""
+    if isinstance(key, np.generic):
+        key = key.item()
+    if key is not None and (isinstance(key, bool) or not isinstance(key, (str, int))):
+        raise TypeError(f"Item keys must be str or int to be saved, got {type(key).__name__}: {key!r}")
+    return key
+
+
+class IncrementalIndex:
+    def __init__(self, k=10, compact_ratio=0.2, max_block_bytes=256 * 2**20):
+        self.k = k
+        self.compact_ratio = compact_ratio
+        self.max_block_bytes = max_block_bytes
+        self.vocab = {}                       # term -> column
+        self.df = np.zeros(0, dtype=np.int64)  # document frequency per column
+        self.keys = []                        # row -> item key (None once removed)
+        self.titles = []
+        self.texts = []
+        self.counts = []                      # row -> Counter(term -> count)
+        self.rows = {}                        # item key -> row
+        self.alive = np.zeros(0, dtype=bool)
+        self.ids = np.zeros((0, k), dtype=np.int32)       # neighbour rows, -1 = empty slot
+        self.scores = np.zeros((0, k), dtype=np.float32)
+        self.changes = 0
+        self._base = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._tail = sparse.csr_matrix((0, 0), dtype=np.float32)  # rows added since the last merge
+
+    # --- building ---
+
+    @classmethod
+    def build(cls, items, k=10, compact_ratio=0.2):
+        """Index from an iterable of (key, title, text); fits everything in one go."""
+        index = cls(k, compact_ratio)
+        for key, title, text in items:
+            if key in index.rows:
+                raise ValueError(f"Duplicate item key: {key!r}")
+            index.rows[key] = len(index.keys)
+            index.keys.append(key)
+            index.titles.append(title)
+            index.texts.append(text)
+            index.counts.append(analyze(text))
+        index.alive = np.ones(len(index.keys), dtype=bool)
+        index.compact()
+        return index
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    @property
+    def n_docs(self):
+        return len(self.rows)
+
+    def idf(self):
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1
+
+    def _vectorize(self, counts, idf):
+        cols = np.fromiter((self.vocab[t] for t in counts), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * idf[cols]
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        order = np.argsort(cols)
+        return sparse.csr_matrix((values[order].astype(np.float32), cols[order], [0, len(cols)]),
+                                 shape=(1, len(self.vocab)))
+
+    def _append(self, vector):
+        """Adds a row vector to the tail; the tail is merged into the base every MERGE_ROWS rows."""
+        self._tail.resize((self._tail.shape[0], vector.shape[1]))  # new terms only add empty columns
+        self._tail = sparse.vstack([self._tail, vector], format="csr", dtype=np.float32)
+        if self._tail.shape[0] >= MERGE_ROWS:
+            self._matrix()
+
+    def _matrix(self):
+        """All row vectors as one CSR matrix (merging the tail into the base)."""
+        if self._tail.shape[0]:
+            for piece in (self._base, self._tail):
+                piece.resize((piece.shape[0], len(self.vocab)))
+            self._base = sparse.vstack([self._base, self._tail], format="csr", dtype=np.float32)
+            self._tail = sparse.csr_matrix((0, len(self.vocab)), dtype=np.float32)
+        elif self._base.shape[1] != len(self.vocab):
+            self._base.resize((self._base.shape[0], len(self.vocab)))
+        return self._base
+
+    def _ensure_capacity(self, rows):
+        if rows > len(self.alive):
+            extra = max(rows - len(self.alive), len(self.alive))  # grow geometrically
+            self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+            self.ids = np.concatenate([self.ids, np.full((extra, self.k), -1, dtype=np.int32)])
+            self.scores = np.concatenate([self.scores, np.full((extra, self.k), -np.inf, dtype=np.float32)])
+
+    def _top_k_rows(self, rows):
+        """Fresh top-k lists for `rows` against all live items (one CSR x dense product)."""
+        matrix = self._matrix()
+        n = matrix.shape[0]
+        sims = (matrix @ matrix[rows].toarray().T).T
+        sims[:, ~self.alive[:n]] = -np.inf
+        sims[np.arange(len(rows)), rows] = -np.inf
+        best = top_k(sims, self.k)
+        scores = np.take_along_axis(sims, best, axis=1)
+        best = np.where(np.isfinite(scores), best, -1)
+        return best.astype(np.int32), scores.astype(np.float32)
+
+    def _set_list(self, row, ids, scores):
+        self.ids[row] = -1
+        self.scores[row] = -np.inf
+        self.ids[row, :len(ids)] = ids
+        self.scores[row, :len(scores)] = scores
+
+    # --- changes ---
+
+    def add(self, key, title, text):
+        if key in self.rows:
+            raise ValueError(f"Item {key!r} already exists (use update())")
+        counts = analyze(text)
+        for term in counts:
+            if term not in self.vocab:
+                self.vocab[term] = len(self.vocab)
+        if len(self.df) < len(self.vocab):
+            self.df = np.concatenate([self.df, np.zeros(len(self.vocab) - len(self.df), dtype=np.int64)])
+        self.df[[self.vocab[t] for t in counts]] += 1
+
+        row = len(self.keys)
+        self.rows[key] = row
+        self.keys.append(key)
+        self.titles.append(title)
+        self.texts.append(text)
+        self.counts.append(counts)
+        self._ensure_capacity(row + 1)
+        self.alive[row] = True
+        vector = self._vectorize(counts, self.idf())
+        self._append(vector)
+
+        # One pass over the catalogue gives both directions of the new similarities
+        query = vector.toarray().ravel()
+        sims = np.concatenate([part @ query[:part.shape[1]] for part in (self._base, self._tail)])
+        sims[~self.alive[:len(sims)]] = -np.inf
+        sims[row] = -np.inf
+        best = top_k(sims, self.k)[0]
+        keep = np.isfinite(sims[best])
+        self._set_list(row, best[keep], sims[best][keep])
+
+        # Insert the new item into every list whose k-th neighbour it beats
+        better = np.nonzero(sims[:row] > self.scores[:row, -1])[0]
+        for other in better:
+            position = np.searchsorted(-self.scores[other], -sims[other])
+            self.ids[other, position + 1:] = self.ids[other, position:-1].copy()
+            self.scores[other, position + 1:] = self.scores[other, position:-1].copy()
+            self.ids[other, position] = row
+            self.scores[other, position] = sims[other]
+        self._changed()
+        return row
+
+    def remove(self, key):
+        row = self.rows.pop(key)
+        self.df[[self.vocab[t] for t in self.counts[row]]] -= 1
+        self.alive[row] = False
+        self.keys[row] = None
+        self.counts[row] = Counter()
+        self.texts[row] = None
+        self._set_list(row, [], [])
+
+        matrix = self._matrix()
+        matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]] = 0  # dropped for good at compaction
+
+        n = matrix.shape[0]
+        affected = np.nonzero((self.ids[:n] == row).any(axis=1) & self.alive[:n])[0]
+        rows_per_block = block_size(n, self.max_block_bytes, matrix.shape[1])
+        for start in range(0, len(affected), rows_per_block):
+            block = affected[start:start + rows_per_block]
+            ids, scores = self._top_k_rows(block)
+            for r, row_ids, row_scores in zip(block, ids, scores):
+                self._set_list(r, row_ids, row_scores)
+        self._changed()
+
+    def update(self, key, title=None, text=None):
+        row = self.rows[key]
+        title = self.titles[row] if title is None else title
+        if text is None or text == self.texts[row]:
+            self.titles[row] = title  # same content: neighbours don't change
+            return row
+        self.remove(key)
+        return self.add(key, title, text)
+
+    def _changed(self):
+        self.changes += 1
+        if self.changes > self.compact_ratio * max(len(self), 1):
+            self.compact()
+
+    def compact(self):
+        """Drops removed rows and refits vocabulary, idf, vectors and neighbour lists exactly."""
+        live = [r for r in range(len(self.keys)) if self.keys[r] is not None and self.alive[r]]
+        self.keys = [self.keys[r] for r in live]
+        self.titles = [self.titles[r] for r in live]
+        self.texts = [self.texts[r] for r in live]
+        self.counts = [self.counts[r] for r in live]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+        df = Counter(term for counts in self.counts for term in counts)
+        self.vocab = {term: col for col, term in enumerate(sorted(df))}  # sorted, like TfidfVectorizer
+        self.df = np.array([df[t] for t in self.vocab], dtype=np.int64)
+        idf = self.idf()
+        self._tail = sparse.csr_matrix((0, len(self.vocab)), dtype=np.float32)
+        if self.counts:
+            self._base = sparse.vstack([self._vectorize(c, idf) for c in self.counts], format="csr", dtype=np.float32)
+        else:
+            self._base = sparse.csr_matrix((0, len(self.vocab)), dtype=np.float32)
+
+        n = len(self.keys)
+        self.alive = np.ones(n, dtype=bool)
+        self.ids = np.full((n, self.k), -1, dtype=np.int32)
+        self.scores = np.full((n, self.k), -np.inf, dtype=np.float32)
+        ids, scores = build_neighbours(self._base, self.k, max_block_bytes=self.max_block_bytes)
+        self.ids[:, :ids.shape[1]] = ids
+        self.scores[:, :scores.shape[1]] = scores
+        self.changes = 0
+
+    # --- queries ---
+
+    def recommend(self, key, k=None):
+        """[(key, title, score), ...] of the most similar live items, best first."""
+        row = self.rows[key]
+        k = self.k if k is None else min(k, self.k)
+        return [(self.keys[r], self.titles[r], float(s))
+                for r, s in zip(self.ids[row, :k], self.scores[row, :k]) if r >= 0]
+
+    # --- persistence ---
+
+    def save(self, directory):
+        """Writes the index to a temporary directory, then swaps it in for `directory`.
+
+        Readers see the old index or the new one, never a mix. Keys that can't
+        round-trip through JSON raise TypeError before anything is written.
+        """
+        items = {"keys": [_json_key(key) for key in self.keys],
+                 "titles": [t.item() if isinstance(t, np.generic) else t for t in self.titles],
+                 "texts": [t.item() if isinstance(t, np.generic) else t for t in self.texts],
+                 "vocab": sorted(self.vocab, key=self.vocab.get)}
+        items = json.dumps(items)
+        matrix = self._matrix()
+        n = matrix.shape[0]
+        meta = {"version": INDEX_VERSION, "k": self.k, "compact_ratio": self.compact_ratio,
+                "changes": self.changes, "rows": n}
+
+        directory = os.path.normpath(directory)
+        tmp_dir = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        sparse.save_npz(os.path.join(tmp_dir, "matrix.npz"), matrix)
+        np.save(os.path.join(tmp_dir, "df.npy"), self.df)
+        np.save(os.path.join(tmp_dir, "alive.npy"), self.alive[:n])
+        np.save(os.path.join(tmp_dir, "neighbour_ids.npy"), self.ids[:n])
+        np.save(os.path.join(tmp_dir, "neighbour_scores.npy"), self.scores[:n])
+        with open(os.path.join(tmp_dir, "items.json"), "w", encoding="utf-8") as f:
+            f.write(items)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        # Swap the finished directory into place
+        old_dir = f"{directory}.old-{os.getpid()}"
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')} in {directory}")
+        with open(os.path.join(directory, "items.json"), encoding="utf-8") as f:
+            items = json.load(f)
+
+        index = cls(meta["k"], meta["compact_ratio"])
+        index.changes = meta["changes"]
+        index.keys, index.titles, index.texts = items["keys"], items["titles"], items["texts"]
+        index.counts = [analyze(t) if key is not None else Counter() for key, t in zip(index.keys, index.texts)]
+        index.rows = {key: row for row, key in enumerate(index.keys) if key is not None}
+        index.vocab = {term: col for col, term in enumerate(items["vocab"])}
+        index.df = np.load(os.path.join(directory, "df.npy"))
+        index.alive = np.load(os.path.join(directory, "alive.npy"))
+        index.ids = np.load(os.path.join(directory, "neighbour_ids.npy"))
+        index.scores = np.load(os.path.join(directory, "neighbour_scores.npy"))
+        index._base = sparse.load_npz(os.path.join(directory, "matrix.npz")).tocsr()
+        return index
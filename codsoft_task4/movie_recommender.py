@@ -0,0 +1,66 @@
+# -----------------------------------------
+# PREPARED MOVIE RECOMMENDER
+# -----------------------------------------
+# Everything a query needs is built once, up front:
+#   - title index: normalized title -> row (dict lookup, no column scans)
+#   - fuzzy fallback for typos: trigram candidates + difflib (title_matching.py),
+#     built on the first miss
+#   - top-k neighbours from SparseRecommender (argpartition, self excluded)
+#   - titles as a numpy array, so results are one fancy-index, not N .iloc calls
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from recommender_engine import SparseRecommender
+from title_matching import FuzzyTitleMatcher, normalize_title
+
+
+class MovieRecommender:
+    def __init__(self, titles, descriptions, k=10, fuzzy_cutoff=0.8, precompute=True, workers=1):
+        self.titles = np.asarray(list(titles), dtype=object)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.tfidf = TfidfVectorizer()
+        self.engine = SparseRecommender(self.tfidf.fit_transform(descriptions), k=k, precompute=precompute,
+                                        workers=workers)
+
+        self.title_index = {}
+        for row, title in enumerate(self.titles):
+            key = normalize_title(title)
+            if key:  # a title without letters or digits can't be looked up
+                self.title_index.setdefault(key, row)  # first one wins, like .index[0]
+        self._fuzzy = None
+
+    def __len__(self):
+        return len(self.titles)
+
+    def find(self, title, fuzzy=True):
+        """Row of the best-matching title, or None if nothing is close enough."""
+        key = normalize_title(title)
+        if not key:
+            return None
+        row = self.title_index.get(key)
+        if row is None and fuzzy:
+            if self._fuzzy is None:
+                self._fuzzy = FuzzyTitleMatcher(self.title_index, self.fuzzy_cutoff)
+            close = self._fuzzy.match(key)
+            if close is not None:
+                row = self.title_index[close]
+        return row
+
+    def recommend_rows(self, row, k=3):
+        """(ids, scores) of the k most similar other items, best first."""
+        return self.engine.recommend(row, k)
+
+    def find_many(self, titles, fuzzy=True):
+        """Rows for many titles, -1 where a title isn't found."""
+        rows = [self.find(title, fuzzy) for title in titles]
+        return np.array([-1 if row is None else row for row in rows], dtype=np.int64)
+
+    def recommend(self, title, k=3, with_scores=False):
+        """Titles of the k most similar movies, or None if the title isn't in the catalogue."""
+        row = self.find(title)
+        if row is None:
+            return None
+        ids, scores = self.recommend_rows(row, k)
+        titles = self.titles[ids].tolist()
+        return list(zip(titles, scores.tolist())) if with_scores else titles
@@ -2,9 +2,12 @@
 # SIMPLE CONTENT-BASED RECOMMENDATION SYSTEM
 # -----------------------------------------
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import argparse
+import os
+
+from recommender_store import FORMAT_VERSION, RecommenderStore, build_store, catalogue_hash, read_manifest
+
+STORE_DIR = os.environ.get("RECOMMENDER_STORE", "recommender_store")
 
 # -------------------------------
 # Step 1: Create Movie Dataset
@@ -28,50 +31,63 @@ data = {
     ]
 }
 
-movies = pd.DataFrame(data)
-
-# Create a lowercase version of titles for matching
-movies['title_lower'] = movies['title'].str.lower()
-
 # -------------------------------
 # Step 2: Convert Genre to Numbers
-# -------------------------------
-tfidf = TfidfVectorizer()
-tfidf_matrix = tfidf.fit_transform(movies['genre'])
-
-# -------------------------------
 # Step 3: Calculate Similarity
 # -------------------------------
-cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+# Done once by the build step, not on every start: TF-IDF, the top 10
+# neighbours of each movie and the title index are written to STORE_DIR
+def build(store_dir=STORE_DIR):
+    return build_store(data['title'], data['genre'], store_dir, k=10)
+
+
+_store = None
+
+
+def get_store():
+    # Serving only memory-maps the store, so startup does not depend on catalogue size.
+    # The store is rebuilt if it is missing, from another format version, or
+    # built from a different catalogue than `data`.
+    global _store
+    if _store is None:
+        manifest = read_manifest(STORE_DIR)
+        if (manifest is None or manifest.get("format_version") != FORMAT_VERSION
+                or manifest.get("catalogue_hash") != catalogue_hash(data['title'], data['genre'])):
+            build()
+        _store = RecommenderStore(STORE_DIR)
+    return _store
 
 # -------------------------------
 # Step 4: Recommendation Function
 # -------------------------------
 def recommend_movie(movie_name):
-    movie_name = movie_name.lower()  # convert user input to lowercase
+    # Matching ignores case, punctuation and extra spaces, and tolerates small typos
+    recommended_movies = get_store().recommend(movie_name, k=3)
 
-    if movie_name not in movies['title_lower'].values:
+    if recommended_movies is None:
         return "Movie not found in database."
 
-    index = movies[movies['title_lower'] == movie_name].index[0]
-    similarity_scores = list(enumerate(cosine_sim[index]))
-    similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-
-    recommended_movies = []
-    for i in similarity_scores[1:4]:
-        recommended_movies.append(movies.iloc[i[0]]['title'])
-
     return recommended_movies
 
 # -------------------------------
 # Step 5: User Input
 # -------------------------------
-print("Available Movies:")
-print(movies['title'].to_string(index=False))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-based movie recommendations.")
+    parser.add_argument("--build", action="store_true", help=f"rebuild the store in {STORE_DIR} and exit")
+    args = parser.parse_args()
+
+    if args.build:
+        manifest = build()
+        print(f"Built {STORE_DIR}: {manifest['items']} movies in {manifest['build_seconds']}s")
+    else:
+        store = get_store()
+        print("Available Movies:")
+        print("\n".join(store.titles(range(len(store)))))
 
-user_movie = input("\nEnter a movie you like: ")
+        user_movie = input("\nEnter a movie you like: ")
 
-recommendations = recommend_movie(user_movie)
+        recommendations = recommend_movie(user_movie)
 
-print("\nRecommended Movies:")
-print(recommendations)
\ No newline at end of file
+        print("\nRecommended Movies:")
+        print(recommendations)
@@ -0,0 +1,157 @@
+# -----------------------------------------
+# SPARSE TOP-K RECOMMENDER ENGINE
+# -----------------------------------------
+# cosine_similarity(tfidf_matrix, tfidf_matrix) builds a dense N x N matrix:
+# 8 * N^2 bytes, i.e. 80 GB for 100k titles. TfidfVectorizer rows are already
+# L2-normalized, so cosine similarity is just a dot product, and the engine
+# only ever keeps:
+#   - the sparse TF-IDF matrix (CSR, float32)
+#   - optionally, the top-k neighbours of every item (N x k ids + scores),
+#     computed block by block (CSR x dense products) so the working memory of
+#     one block never exceeds max_block_bytes
+# Memory is O(nnz + N * k). Items without a precomputed list (or asking for
+# more than k) are answered with one sparse matrix-vector product.
+
+import numpy as np
+from scipy import sparse
+
+
+def top_k(scores, k):
+    """Indices of the k largest scores per row, best first (argpartition, then sort only k)."""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def rows_top_k(matrix, rows, k):
+    """Top-k neighbours (excluding themselves) of the given rows; one CSR x dense product.
+
+    The similarity block is mostly dense for genre-like text, so the queries are
+    densified and the product written straight into one dense array (a sparse
+    result would be ~2x larger and much slower to build).
+    """
+    rows = np.asarray(rows)
+    if k <= 0:
+        return np.empty((len(rows), 0), dtype=np.int32), np.empty((len(rows), 0), dtype=np.float32)
+    queries = matrix[rows].toarray().T              # n_features x B
+    neg_sims = (matrix @ queries).T                 # B x N view, negated in place below
+    np.negative(neg_sims, out=neg_sims)
+    neg_sims[np.arange(len(rows)), rows] = np.inf   # never recommend an item to itself
+    part = np.argpartition(neg_sims, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(neg_sims, part, axis=1)
+    order = np.argsort(part_scores, axis=1, kind="stable")
+    best = np.take_along_axis(part, order, axis=1)
+    return best.astype(np.int32), -np.take_along_axis(part_scores, order, axis=1)
+
+
+def block_size(n, max_block_bytes, n_features=0):
+    """Query rows per block so one block's working memory fits in max_block_bytes.
+
+    Per query row: its densified TF-IDF column (4 * n_features bytes), its row of
+    float32 similarities (4 * n) and argpartition's int64 indices (8 * n).
+    """
+    return max(1, min(n, max_block_bytes // (12 * n + 4 * n_features)))
+
+
+_worker = {}
+
+
+def _init_worker(matrix):
+    _worker["matrix"] = matrix
+
+
+def _worker_block(offset, rows, k):
+    return offset, *rows_top_k(_worker["matrix"], rows, k)
+
+
+def iter_top_k(matrix, rows=None, k=10, max_block_bytes=256 * 2**20, workers=1):
+    """Yields (offset, ids, scores) for consecutive blocks of `rows` (default: every row), in order.
+
+    With workers > 1 blocks run in a process pool. At most 2 * workers blocks
+    are in flight, so memory stays bounded however many rows are asked for.
+    """
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    n = matrix.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+    k = min(k, max(n - 1, 0))
+    step = block_size(n, max_block_bytes, matrix.shape[1])
+    blocks = ((offset, rows[offset:offset + step]) for offset in range(0, len(rows), step))
+
+    if workers <= 1:
+        for offset, block in blocks:
+            yield (offset, *rows_top_k(matrix, block, k))
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+        pending = deque()
+        for offset, block in blocks:
+            pending.append(pool.submit(_worker_block, offset, block, k))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_neighbours(matrix, k=10, max_block_bytes=256 * 2**20, workers=1):
+    """Top-k most similar other items for every row of an L2-normalized CSR matrix.
+
+    Returns (ids int32 N x k, scores float32 N x k). Rows are processed in blocks
+    sized so that one block's working memory fits in max_block_bytes.
+    """
+    n = matrix.shape[0]
+    k = min(k, max(n - 1, 0))
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    if k == 0:
+        return ids, scores
+    for offset, block_ids, block_scores in iter_top_k(matrix, None, k, max_block_bytes, workers):
+        ids[offset:offset + len(block_ids)] = block_ids
+        scores[offset:offset + len(block_ids)] = block_scores
+    return ids, scores
+
+
+class SparseRecommender:
+    def __init__(self, tfidf_matrix, k=10, precompute=True, max_block_bytes=256 * 2**20, workers=1):
+        # Rows must be L2-normalized (TfidfVectorizer's default norm='l2')
+        self.matrix = sparse.csr_matrix(tfidf_matrix, dtype=np.float32)
+        self.k = k
+        self.neighbour_ids = None
+        self.neighbour_scores = None
+        if precompute:
+            self.neighbour_ids, self.neighbour_scores = build_neighbours(self.matrix, k, max_block_bytes, workers)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def similarities(self, row):
+        """Cosine similarity of item `row` to every item (one sparse mat-vec)."""
+        return (self.matrix @ self.matrix[row].T).toarray().ravel()
+
+    def recommend(self, row, k=3):
+        """(ids, scores) of the k items most similar to `row`, excluding itself, best first."""
+        if self.neighbour_ids is not None and k <= self.neighbour_ids.shape[1]:
+            return self.neighbour_ids[row, :k], self.neighbour_scores[row, :k]
+        sims = self.similarities(row)
+        sims[row] = -np.inf
+        best = top_k(sims, min(k, len(sims) - 1))[0]
+        return best, sims[best]
+
+    def recommend_many(self, rows, k=10, max_block_bytes=256 * 2**20, workers=1):
+        """(ids Q x k, scores Q x k) for many query rows: table lookups, or blocked products past k."""
+        rows = np.asarray(rows)
+        if self.neighbour_ids is not None and k <= self.neighbour_ids.shape[1]:
+            return self.neighbour_ids[rows, :k], self.neighbour_scores[rows, :k]
+        k = min(k, max(len(self) - 1, 0))
+        ids = np.empty((len(rows), k), dtype=np.int32)
+        scores = np.empty((len(rows), k), dtype=np.float32)
+        for offset, block_ids, block_scores in iter_top_k(self.matrix, rows, k, max_block_bytes, workers):
+            ids[offset:offset + len(block_ids)] = block_ids
+            scores[offset:offset + len(block_ids)] = block_scores
+        return ids, scores
@@ -0,0 +1,196 @@
+# -----------------------------------------
+# MEMORY-MAPPED RECOMMENDER ARTIFACTS
+# -----------------------------------------
+# build_store() fits the recommender once and writes everything serving needs
+# as plain .npy files. RecommenderStore opens them with np.load(mmap_mode='r'),
+# so opening takes milliseconds whatever the catalogue size. Every serving
+# process on the machine shares one page-cached copy. Only build_store()
+# needs scikit-learn; it is imported there, not at module level.
+#
+# Layout of a store directory (FORMAT_VERSION 1):
+#   manifest.json           version, sizes, k, catalogue_hash of the titles and
+#                           descriptions it was built from (written last: its
+#                           presence = complete store)
+#   vocab.json, idf.npy     TF-IDF vocabulary (column order) and idf weights
+#   tfidf_data.npy, tfidf_indices.npy, tfidf_indptr.npy
+#                           the L2-normalized TF-IDF matrix in CSR form
+#   neighbour_ids.npy, neighbour_scores.npy
+#                           top-k table (N x k int32 / float32)
+#   titles.npy, title_offsets.npy
+#                           all titles as one UTF-8 byte array + row offsets
+#   title_hashes.npy, title_rows.npy
+#                           title index: sorted 64-bit hashes of normalized
+#                           titles and their rows (binary search, no dict to build)
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+from recommender_engine import top_k
+from title_matching import FuzzyTitleMatcher, normalize_title, title_hash
+
+FORMAT_VERSION = 1
+
+
+def catalogue_hash(titles, descriptions):
+    """Hex digest of the catalogue contents; a store whose manifest differs is stale."""
+    digest = hashlib.blake2b(digest_size=16)
+    for title, description in zip(titles, descriptions):
+        for value in (title, description):
+            encoded = str(value).encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+    return digest.hexdigest()
+
+
+def read_manifest(store_dir):
+    """The store's manifest, or None if there is no complete store in store_dir."""
+    try:
+        with open(os.path.join(store_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def build_store(titles, descriptions, store_dir, k=10, workers=1):
+    """Fits TF-IDF + top-k neighbours and writes a complete store to store_dir (replacing any old one)."""
+    from movie_recommender import MovieRecommender  # pulls in scikit-learn
+
+    start = time.perf_counter()
+    titles, descriptions = list(titles), list(descriptions)
+    recommender = MovieRecommender(titles, descriptions, k=k, workers=workers)
+    matrix = recommender.engine.matrix
+    matrix.sort_indices()
+
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    def save(name, array):
+        np.save(os.path.join(tmp_dir, name), array)
+
+    vocab = sorted(recommender.tfidf.vocabulary_, key=recommender.tfidf.vocabulary_.get)
+    with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    save("idf.npy", recommender.tfidf.idf_.astype(np.float32))
+    save("tfidf_data.npy", matrix.data.astype(np.float32))
+    # Same dtype for both, so scipy can wrap the memory maps without converting (copying) them
+    index_dtype = np.int32 if matrix.nnz < 2**31 else np.int64
+    save("tfidf_indices.npy", matrix.indices.astype(index_dtype))
+    save("tfidf_indptr.npy", matrix.indptr.astype(index_dtype))
+    save("neighbour_ids.npy", recommender.engine.neighbour_ids)
+    save("neighbour_scores.npy", recommender.engine.neighbour_scores)
+
+    encoded = [str(t).encode("utf-8") for t in recommender.titles]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    save("titles.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    save("title_offsets.npy", offsets)
+
+    # Title index: the first row wins for duplicate titles, like MovieRecommender.title_index
+    hashes = np.array([title_hash(key) for key in recommender.title_index], dtype=np.uint64)
+    rows = np.array(list(recommender.title_index.values()), dtype=np.int64)
+    order = np.argsort(hashes, kind="stable")
+    save("title_hashes.npy", hashes[order])
+    save("title_rows.npy", rows[order])
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "items": len(recommender),
+        "vocab_size": len(vocab),
+        "nnz": int(matrix.nnz),
+        "k": int(recommender.engine.neighbour_ids.shape[1]),
+        "catalogue_hash": catalogue_hash(titles, descriptions),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory into place
+    old_dir = f"{store_dir}.old-{os.getpid()}"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+class RecommenderStore:
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{store_dir} has format version {self.manifest.get('format_version')}, "
+                             f"expected {FORMAT_VERSION}; rebuild it")
+
+        def load(name):
+            return np.load(os.path.join(store_dir, name), mmap_mode="r")
+
+        self.store_dir = store_dir
+        self.neighbour_ids = load("neighbour_ids.npy")
+        self.neighbour_scores = load("neighbour_scores.npy")
+        self._titles = load("titles.npy")
+        self._title_offsets = load("title_offsets.npy")
+        self._title_hashes = load("title_hashes.npy")
+        self._title_rows = load("title_rows.npy")
+        n = self.manifest["items"]
+        self.matrix = sparse.csr_matrix(
+            (load("tfidf_data.npy"), load("tfidf_indices.npy"), load("tfidf_indptr.npy")),
+            shape=(n, self.manifest["vocab_size"]), copy=False)
+        self._fuzzy = None
+        self._fuzzy_rows = None
+
+    def __len__(self):
+        return self.manifest["items"]
+
+    def title(self, row):
+        start, stop = self._title_offsets[row], self._title_offsets[row + 1]
+        return self._titles[start:stop].tobytes().decode("utf-8")
+
+    def titles(self, rows):
+        return [self.title(row) for row in rows]
+
+    def find(self, title, fuzzy=True):
+        """Row of the best-matching title, or None."""
+        key = normalize_title(title)
+        if not key:
+            return None
+        h = np.uint64(title_hash(key))
+        i = np.searchsorted(self._title_hashes, h)
+        while i < len(self._title_hashes) and self._title_hashes[i] == h:
+            row = int(self._title_rows[i])
+            if normalize_title(self.title(row)) == key:  # guard against hash collisions
+                return row
+            i += 1
+        if fuzzy:
+            if self._fuzzy is None:  # only paid on the first typo
+                self._fuzzy_rows = {normalize_title(self.title(int(r))): int(r) for r in self._title_rows}
+                self._fuzzy = FuzzyTitleMatcher(self._fuzzy_rows)
+            close = self._fuzzy.match(key)
+            if close is not None:
+                return self._fuzzy_rows[close]
+        return None
+
+    def recommend_rows(self, row, k=3):
+        """(ids, scores) of the k most similar other items, from the table or one sparse mat-vec."""
+        if k <= self.neighbour_ids.shape[1]:
+            return np.asarray(self.neighbour_ids[row, :k]), np.asarray(self.neighbour_scores[row, :k])
+        sims = (self.matrix @ self.matrix[row].T).toarray().ravel()
+        sims[row] = -np.inf
+        best = top_k(sims, min(k, len(sims) - 1))[0]
+        return best, sims[best]
+
+    def recommend(self, title, k=3, with_scores=False):
+        """Titles of the k most similar movies, or None if the title isn't in the catalogue."""
+        row = self.find(title)
+        if row is None:
+            return None
+        ids, scores = self.recommend_rows(row, k)
+        titles = self.titles(ids)
+        return list(zip(titles, scores.tolist())) if with_scores else titles
@@ -0,0 +1,213 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from face_matcher import FaceMatcher, identity_name
+from process_static_image import load_gallery, process_image
+
+# ==========================================
+# BATCH MODE FOR process_static_image
+# ==========================================
+# Encodes the gallery once (via the encoding store), puts it in read-only
+# shared memory and fans detection out to a ProcessPoolExecutor. Every
+# finished image is appended to <output>/manifest.jsonl straight away, so an
+# interrupted nightly run can be resumed with --resume. Results mirror the
+# inputs' folders under <output>, so imgs/a/x.jpg and imgs/b/x.jpg don't collide.
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+MANIFEST_NAME = "manifest.jsonl"
+
+# Set in each worker by _init_worker
+_worker_matcher = None
+_worker_shm = None
+
+
+def expand_inputs(inputs, exclude=()):
+    """Turns files, directories and glob patterns into a sorted, de-duplicated image list.
+
+    Directories are searched recursively, skipping hidden folders and the
+    folders in `exclude` (e.g. the output folder, so results aren't re-processed).
+    """
+    skip = {os.path.abspath(d) for d in exclude}
+    images = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for folder, subfolders, files in os.walk(item):
+                subfolders[:] = sorted(d for d in subfolders if not d.startswith(".")
+                                       and os.path.abspath(os.path.join(folder, d)) not in skip)
+                images += [os.path.join(folder, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+        elif os.path.isfile(item):
+            images.append(item)
+        else:
+            images += [p for p in glob.glob(item, recursive=True) if p.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(set(images))
+
+
+def output_paths(images, output_dir):
+    """Maps each image to <output_dir>/<its folder relative to the inputs' common folder>/result_<name>."""
+    folders = [os.path.dirname(os.path.abspath(p)) for p in images]
+    try:
+        base = os.path.commonpath(folders) if folders else ""
+    except ValueError:  # different drives on Windows
+        base = ""
+    paths = {}
+    for image, folder in zip(images, folders):
+        if base:
+            rel = os.path.relpath(folder, base)
+        else:
+            rel = folder.replace(":", "").lstrip("\\/")
+        paths[image] = os.path.normpath(os.path.join(output_dir, rel, "result_" + os.path.basename(image)))
+    return paths
+
+
+def _attach_shared(name):
+    """Attaches to the parent's segment; the parent alone unlinks it.
+
+    Pool workers share the parent's resource tracker, so they must not
+    unregister the segment (the parent's unlink() would then fail with a
+    KeyError). Before Python 3.13 attaching registers it a second time,
+    which the tracker ignores.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(shm_name, shape, names):
+    global _worker_matcher, _worker_shm
+    _worker_shm = _attach_shared(shm_name)
+    gallery = np.ndarray(shape, dtype=np.float32, buffer=_worker_shm.buf)
+    gallery.flags.writeable = False
+    # Rows are already grouped by identity, so FaceMatcher uses the shared buffer as-is
+    _worker_matcher = FaceMatcher(gallery, names)
+
+
+def _process_one(image_path, output_path):
+    start = time.perf_counter()
+    try:
+        faces = process_image(image_path, matcher=_worker_matcher, quiet=True, output_path=output_path)
+        error = None if faces is not None else "could not read image"
+    except Exception as e:
+        faces, error = None, str(e)
+    record = {
+        "image": image_path,
+        "output": output_path if faces is not None else None,
+        "faces": faces or [],
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if error:
+        record["error"] = error
+    return record
+
+
+def read_manifest(manifest_path):
+    """Returns the set of images already processed successfully."""
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # half-written last line from an interrupted run
+            if "error" not in record:
+                done.add(record["image"])
+    return done
+
+
+def _trim_partial_line(manifest_path):
+    """Cuts a half-written last line (interrupted run), so the next record starts on a line of its own."""
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+def process_batch(images, known_faces_dir="known_faces", output_dir="output", workers=None, resume=False):
+    """Processes many images with a process pool; returns (processed, failed) counts."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    # From the full list, so a resumed run writes to the same places
+    outputs = output_paths(images, output_dir)
+
+    if resume:
+        done = read_manifest(manifest_path)
+        skipped = len(images)
+        images = [p for p in images if p not in done]
+        print(f"Resuming: {skipped - len(images)} image(s) already done.")
+    if not images:
+        print("Nothing to do.")
+        return 0, 0
+
+    # Encode the gallery once, grouped by identity so workers need no private copy
+    encodings, names = load_gallery(known_faces_dir)
+    names = [identity_name(n) for n in names]
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+    first_seen = {}
+    order = sorted(range(len(names)), key=lambda i: (first_seen.setdefault(names[i], i), i))
+    encodings = encodings[order]
+    names = [names[i] for i in order]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, encodings.nbytes))
+    np.ndarray(encodings.shape, dtype=np.float32, buffer=shm.buf)[:] = encodings
+
+    _trim_partial_line(manifest_path)
+    workers = workers or os.cpu_count() or 1
+    print(f"Processing {len(images)} image(s) with {workers} worker(s), gallery of {len(names)} encoding(s)...")
+    processed = failed = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, encodings.shape, names)) as pool, \
+                open(manifest_path, "a", encoding="utf-8") as manifest:
+            pending = set()
+            queue = iter(images)
+            # Keep a bounded number of tasks in flight so huge runs don't queue everything
+            for image_path in queue:
+                pending.add(pool.submit(_process_one, image_path, outputs[image_path]))
+                if len(pending) < workers * 4:
+                    continue
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    processed, failed = _write_record(manifest, future.result(), processed, failed)
+            for future in wait(pending).done:
+                processed, failed = _write_record(manifest, future.result(), processed, failed)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {processed} processed, {failed} failed in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} images/s). Manifest: {manifest_path}")
+    return processed, failed
+
+
+def _write_record(manifest, record, processed, failed):
+    manifest.write(json.dumps(record) + "\n")
+    manifest.flush()
+    if "error" in record:
+        print(f"Failed: {record['image']} ({record['error']})")
+        return processed, failed + 1
+    return processed + 1, failed
@@ -0,0 +1,234 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# ==========================================
+# DETECTION / RECOGNITION BENCHMARK HARNESS
+# ==========================================
+# Replays a folder of images (or frames from a video) through each detector
+# configuration used in this project:
+#
+#   haar      simple_detection.py        (OpenCV Haar cascade, detection only)
+#   hog       process_static_image.py    (default HOG + encode + match @0.6)
+#   cnn       face_recognition_app.py    (CNN, HOG fallback + encode + match @0.5)
+#   adaptive  detection_strategy.py      (budgeted coarse/refine + encode + match @0.5)
+#
+# and reports per-stage latency percentiles, throughput, peak RSS and, given
+# a ground-truth file, detection precision/recall and recognition accuracy.
+# Each configuration runs in its own process so peak RSS is per configuration.
+#
+# Ground truth JSON: {"<image file name or frame_000042>": [{"box": [top, right, bottom, left],
+#                                                            "name": "yuvedha"}, ...], ...}
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+CONFIGS = ("haar", "hog", "cnn", "adaptive")
+
+
+def load_frames(source, stride=1, max_frames=None):
+    """Yields (key, bgr_image) from an image directory or a video file."""
+    if os.path.isdir(source):
+        files = sorted(f for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for filename in files[:max_frames]:
+            image = cv2.imread(os.path.join(source, filename))
+            if image is not None:
+                yield filename, image
+        return
+
+    capture = cv2.VideoCapture(source)
+    index = emitted = 0
+    try:
+        while max_frames is None or emitted < max_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            if index % stride == 0:
+                yield f"frame_{index:06d}", frame
+                emitted += 1
+            index += 1
+    finally:
+        capture.release()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return None
+    arr = np.asarray(values) * 1000
+    return {"p50": round(float(np.percentile(arr, 50)), 2), "p90": round(float(np.percentile(arr, 90)), 2),
+            "p99": round(float(np.percentile(arr, 99)), 2), "mean": round(float(arr.mean()), 2)}
+
+
+def make_config(name, known_faces_dir, detection_budget):
+    """Returns (detect_fn(bgr, rgb) -> boxes, matcher or None, tolerance)."""
+    if name == "haar":
+        from simple_detection import haar_face_boxes
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        return (lambda bgr, rgb: haar_face_boxes(cascade, bgr)), None, None
+
+    import face_recognition
+    from process_static_image import load_matcher
+    matcher = load_matcher(known_faces_dir)
+    if name == "hog":
+        return (lambda bgr, rgb: face_recognition.face_locations(rgb)), matcher, 0.6
+    if name == "cnn":
+        from detection_strategy import legacy_detect
+        return (lambda bgr, rgb: legacy_detect(rgb)), matcher, 0.5
+    if name == "adaptive":
+        from detection_strategy import DetectionStrategy
+        strategy = DetectionStrategy(detection_budget)
+        return (lambda bgr, rgb: strategy.detect(rgb)), matcher, 0.5
+    raise ValueError(f"Unknown config: {name}")
+
+
+def score(predictions, ground_truth, iou_threshold=0.5):
+    """Greedy IoU matching of predicted vs labelled faces."""
+    from face_tracker import box_iou
+    tp = fp = fn = named = named_correct = 0
+    for key, truth in ground_truth.items():
+        if key not in predictions:
+            continue
+        preds = list(predictions[key])
+        for face in truth:
+            best = max(preds, key=lambda p: box_iou(p["box"], face["box"]), default=None)
+            if best is not None and box_iou(best["box"], face["box"]) >= iou_threshold:
+                preds.remove(best)
+                tp += 1
+                if "name" in face and best.get("name") is not None:
+                    named += 1
+                    named_correct += best["name"] == face["name"]
+            else:
+                fn += 1
+        fp += len(preds)
+    return {
+        "true_positives": tp, "false_positives": fp, "false_negatives": fn,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        "recognition_accuracy": round(named_correct / named, 4) if named else None,
+    }
+
+
+def run_config(name, args):
+    """Runs one configuration over every frame (meant to run in its own process)."""
+    import face_recognition
+
+    detect, matcher, tolerance = make_config(name, args.known_faces, args.budget)
+    timings = {"decode": [], "detect": [], "encode": [], "match": [], "total": []}
+    predictions = {}
+    frames = 0
+    start_all = time.perf_counter()
+
+    load_start = time.perf_counter()
+    for key, bgr in load_frames(args.source, args.stride, args.max_frames):
+        t0 = time.perf_counter()
+        timings["decode"].append(t0 - load_start)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+        boxes = detect(bgr, rgb)
+        t1 = time.perf_counter()
+        timings["detect"].append(t1 - t0)
+
+        names = [None] * len(boxes)
+        distances = [None] * len(boxes)
+        if matcher is not None:
+            encodings = face_recognition.face_encodings(rgb, boxes)
+            t2 = time.perf_counter()
+            results = matcher.match(encodings, tolerance=tolerance)
+            t3 = time.perf_counter()
+            timings["encode"].append(t2 - t1)
+            timings["match"].append(t3 - t2)
+            names = [r.name for r in results]
+            distances = [r.distance for r in results]
+
+        timings["total"].append(time.perf_counter() - t0)
+        predictions[key] = [{"box": [int(v) for v in box], "name": n, "distance": d}
+                            for box, n, d in zip(boxes, names, distances)]
+        frames += 1
+        load_start = time.perf_counter()
+
+    elapsed = time.perf_counter() - start_all
+    return {
+        "frames": frames,
+        "faces": sum(len(p) for p in predictions.values()),
+        "throughput_fps": round(frames / elapsed, 3) if elapsed else None,
+        "latency_ms": {stage: percentiles(values) for stage, values in timings.items() if values},
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        "predictions": predictions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detection/recognition configurations.")
+    parser.add_argument("source", help="directory of images or a video file")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=CONFIGS)
+    parser.add_argument("--ground-truth", help="labelled faces JSON (see header of this file)")
+    parser.add_argument("--known-faces", default="known_faces")
+    parser.add_argument("--budget", type=float, default=3.0, help="latency budget for 'adaptive' (s)")
+    parser.add_argument("--stride", type=int, default=1, help="use every Nth video frame")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--keep-predictions", action="store_true", help="store per-image boxes in the JSON")
+    args = parser.parse_args()
+
+    ground_truth = None
+    if args.ground_truth:
+        with open(args.ground_truth, "r", encoding="utf-8") as f:
+            ground_truth = json.load(f)
+
+    report = {
+        "meta": {
+            "source": args.source,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "configs": {},
+    }
+
+    # A fresh process per configuration keeps peak RSS and model caches separate
+    context = multiprocessing.get_context("spawn")
+    for name in args.configs:
+        print(f"Running '{name}'...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_config, name, args).result()
+        if ground_truth is not None:
+            result["accuracy"] = score(result["predictions"], ground_truth)
+        if not args.keep_predictions:
+            del result["predictions"]
+        report["configs"][name] = result
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'config':>9} | {'frames':>6} | {'fps':>7} | {'p50 ms':>8} | {'p99 ms':>8} | {'RSS MB':>7} | "
+          f"{'recall':>6} | {'recog':>6}")
+    print("-" * 80)
+    for name, result in report["configs"].items():
+        total = result["latency_ms"].get("total") or {}
+        accuracy = result.get("accuracy", {})
+        print(f"{name:>9} | {result['frames']:>6} | {result['throughput_fps'] or 0:>7.2f} | "
+              f"{total.get('p50', 0):>8.1f} | {total.get('p99', 0):>8.1f} | {result['peak_rss_mb'] or 0:>7.1f} | "
+              f"{str(accuracy.get('recall', '-')):>6} | {str(accuracy.get('recognition_accuracy', '-')):>6}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
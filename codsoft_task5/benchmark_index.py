@@ -0,0 +1,76 @@
+import argparse
+import time
+
+import numpy as np
+
+from face_index import BruteForceIndex, IVFIndex
+
+# ==========================================
+# IVF RECALL vs LATENCY BENCHMARK
+# ==========================================
+# Builds a synthetic clustered gallery (people drawn around shared "look"
+# centres, as real face encodings are), then measures the IVF index at
+# several nprobe values against exact brute-force distances:
+#   - top-1 recall: same nearest encoding as the exact search
+#   - match recall: of the queries whose exact best distance is within the
+#     app's tolerance (0.5), how many the IVF index also matches within it
+
+
+def synthetic_gallery(rng, size, num_centres=2_000):
+    centres = rng.standard_normal((num_centres, 128)).astype(np.float32) * 0.08
+    people = centres[rng.integers(0, num_centres, size)]
+    return people + rng.standard_normal((size, 128)).astype(np.float32) * 0.05
+
+
+def queries_for(rng, gallery, count):
+    """Half are new photos of enrolled people, half are strangers."""
+    enrolled = gallery[rng.integers(0, len(gallery), count // 2)]
+    enrolled = enrolled + rng.standard_normal(enrolled.shape).astype(np.float32) * 0.02
+    strangers = synthetic_gallery(rng, count - len(enrolled))
+    return np.concatenate([enrolled, strangers])
+
+
+def timed_search(index, queries, **kwargs):
+    start = time.perf_counter()
+    distances, ids = index.search(queries, k=1, **kwargs)
+    return distances[:, 0], ids[:, 0], (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of IVFIndex against exact search.")
+    parser.add_argument("--size", type=int, default=200_000, help="gallery encodings")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (default sqrt(size))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery = synthetic_gallery(rng, args.size)
+    ids = np.arange(args.size)
+    queries = queries_for(rng, gallery, args.queries)
+
+    exact = BruteForceIndex()
+    exact.add(gallery, ids)
+    exact_d, exact_i, exact_ms = timed_search(exact, queries)
+    exact_matches = exact_d <= args.tolerance
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(gallery, ids, num_lists=args.lists)
+    build_s = time.perf_counter() - start
+
+    print(f"Gallery: {args.size} encodings | IVF lists: {len(ivf.centroids)} | build: {build_s:.1f}s")
+    print(f"Exact search: {exact_ms:.3f} ms/query | {exact_matches.sum()} of {len(queries)} "
+          f"queries match within {args.tolerance}")
+    print(f"{'nprobe':>6} | {'ms/query':>8} | {'speedup':>7} | {'top-1 recall':>12} | {'match recall':>12}")
+    print("-" * 58)
+    for nprobe in args.nprobe:
+        d, i, ms = timed_search(ivf, queries, nprobe=nprobe)
+        top1 = np.mean(i == exact_i)
+        found = (d <= args.tolerance) & (i == exact_i)
+        match_recall = found[exact_matches].mean() if exact_matches.any() else float("nan")
+        print(f"{nprobe:>6} | {ms:>8.3f} | {exact_ms / ms:>6.1f}x | {top1:>12.3f} | {match_recall:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+import numpy as np
+
+from face_matcher import FaceMatcher
+
+# ==========================================
+# MATCHER MICRO-BENCHMARK
+# ==========================================
+# Compares the old per-face path (compare_faces + face_distance, i.e. two
+# np.linalg.norm scans of the gallery per face) with FaceMatcher.match on
+# random 128-d encodings. Only numpy is needed, no camera or dlib.
+
+
+def random_encodings(rng, count):
+    vectors = rng.standard_normal((count, 128)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def per_face_baseline(gallery, faces, tolerance):
+    """What run_on_webcam used to do: two full gallery scans for every face."""
+    names = []
+    for face in faces:
+        matches = list(np.linalg.norm(gallery - face, axis=1) <= tolerance)  # compare_faces
+        face_distances = np.linalg.norm(gallery - face, axis=1)             # face_distance
+        best = int(np.argmin(face_distances))
+        names.append(best if matches[best] else -1)
+    return names
+
+
+def time_call(fn, repeats):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FaceMatcher against per-face matching.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--faces", type=int, default=8, help="faces per frame")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tolerance = 0.6
+    print(f"{'identities':>10} | {'per-face (ms)':>13} | {'matcher (ms)':>12} | {'speedup':>7}")
+    print("-" * 53)
+    for size in args.sizes:
+        gallery = random_encodings(rng, size)
+        names = [f"person_{i}" for i in range(size)]
+        # Half the faces are noisy copies of enrolled people so some actually match
+        faces = random_encodings(rng, args.faces)
+        faces[: args.faces // 2] = gallery[: args.faces // 2] + 0.01 * faces[: args.faces // 2]
+
+        matcher = FaceMatcher(gallery, names)
+        baseline_ms = time_call(lambda: per_face_baseline(gallery, faces, tolerance), args.repeats)
+        matcher_ms = time_call(lambda: matcher.match(faces, tolerance, top_k=args.top_k), args.repeats)
+
+        # Both paths must agree on who was recognized
+        expected = per_face_baseline(gallery, faces, tolerance)
+        got = [r.identity for r in matcher.match(faces, tolerance)]
+        assert expected == got, f"matcher disagrees with baseline: {expected} != {got}"
+
+        print(f"{size:>10} | {baseline_ms:>13.2f} | {matcher_ms:>12.2f} | {baseline_ms / matcher_ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
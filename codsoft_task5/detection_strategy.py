@@ -0,0 +1,175 @@
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from face_tracker import box_iou
+
+# ==========================================
+# ADAPTIVE DETECTOR SELECTION
+# ==========================================
+# Running the CNN detector at full resolution on a 12 MP group photo takes
+# tens of seconds on a CPU. DetectionStrategy picks the detector and working
+# resolution from the image size, the hardware and a latency budget:
+#
+#   1. coarse pass: HOG (or CNN on a GPU) on a downscaled copy, with 1x
+#      upsampling so small faces are still found
+#   2. refine pass: each candidate is re-detected in a small crop at full
+#      resolution (CNN if the budget allows), which gives exact boxes
+#
+# Every box is mapped back to original image coordinates.
+# Boxes are (top, right, bottom, left), like face_recognition.
+
+# Rough detector throughput in source pixels/second (use calibrate() to measure)
+HOG_PIXELS_PER_SEC = 8e6
+CNN_CPU_PIXELS_PER_SEC = 0.4e6
+CNN_GPU_PIXELS_PER_SEC = 40e6
+
+# HOG's sliding window is 80x80, so with one upsample the smallest face is ~40 px
+HOG_MIN_FACE = 80
+
+
+def cuda_available():
+    try:
+        import dlib
+        return bool(dlib.DLIB_USE_CUDA) and dlib.cuda.get_num_devices() > 0
+    except Exception:
+        return False
+
+
+def legacy_detect(rgb_image, verbose=False):
+    """The original run_on_image detector: full-res CNN, 2x-upsampled HOG if that fails."""
+    try:
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=1, model="cnn")
+    except Exception:
+        if verbose:
+            print("CNN model failed or too slow, falling back to enhanced HOG...")
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=2, model="hog")
+
+
+def non_max_suppression(boxes, iou_threshold=0.4):
+    """Drops boxes overlapping a larger kept box (keeps the largest first)."""
+    boxes = sorted(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+    kept = []
+    for box in boxes:
+        if all(box_iou(box, k) < iou_threshold for k in kept):
+            kept.append(box)
+    return kept
+
+
+class DetectionStrategy:
+    def __init__(self, latency_budget=3.0, use_cuda=None, refine=True, max_refine_faces=64):
+        self.latency_budget = latency_budget
+        self.use_cuda = cuda_available() if use_cuda is None else use_cuda
+        self.refine = refine
+        self.max_refine_faces = max_refine_faces
+        self.hog_rate = HOG_PIXELS_PER_SEC
+        self.cnn_rate = CNN_GPU_PIXELS_PER_SEC if self.use_cuda else CNN_CPU_PIXELS_PER_SEC
+        self.last_plan = None
+
+    def calibrate(self, size=(480, 640)):
+        """Measures this machine's HOG throughput instead of trusting the default."""
+        image = np.random.default_rng(0).integers(0, 255, size + (3,), dtype=np.uint8)
+        start = time.perf_counter()
+        face_recognition.face_locations(image, number_of_times_to_upsample=1, model="hog")
+        elapsed = time.perf_counter() - start
+        # One upsample means the detector scanned ~4x the pixels
+        self.hog_rate = 4 * size[0] * size[1] / max(elapsed, 1e-6)
+        return self.hog_rate
+
+    def plan(self, shape):
+        """Chooses (model, scale) for the coarse pass so it fits in ~70% of the budget."""
+        pixels = shape[0] * shape[1]
+        coarse_budget = 0.7 * self.latency_budget
+        if 4 * pixels / self.cnn_rate <= coarse_budget:
+            # Small enough for the accurate detector at full resolution
+            self.last_plan = {"model": "cnn", "scale": 1.0, "min_face_px": HOG_MIN_FACE // 2, "refine_model": "cnn"}
+            return self.last_plan
+        model, rate = ("cnn", self.cnn_rate) if self.use_cuda else ("hog", self.hog_rate)
+        # Cost ~ (scale^2 * pixels * 4 for one upsample) / rate
+        scale = min(1.0, float(np.sqrt(coarse_budget * rate / (4 * pixels))))
+        self.last_plan = {
+            "model": model,
+            "scale": round(scale, 4),
+            "min_face_px": int(np.ceil(HOG_MIN_FACE / (2 * scale))),
+            "refine_model": "cnn" if self.use_cuda else "hog",
+        }
+        return self.last_plan
+
+    def detect(self, rgb_image, verbose=False):
+        """Returns face boxes in original image coordinates."""
+        start = time.perf_counter()
+        plan = self.plan(rgb_image.shape)
+        scale = plan["scale"]
+        height, width = rgb_image.shape[:2]
+
+        if scale < 1.0:
+            small = cv2.resize(rgb_image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+            # Use the exact per-axis factors of the resized image for the mapping back
+            sy, sx = small.shape[0] / height, small.shape[1] / width
+        else:
+            small, sy, sx = rgb_image, 1.0, 1.0
+
+        try:
+            coarse = face_recognition.face_locations(small, number_of_times_to_upsample=1, model=plan["model"])
+        except Exception:
+            coarse = face_recognition.face_locations(small, number_of_times_to_upsample=1, model="hog")
+
+        boxes = [(int(round(t / sy)), int(round(r / sx)), int(round(b / sy)), int(round(l / sx)))
+                 for (t, r, b, l) in coarse]
+        boxes = [self._clip(box, height, width) for box in boxes]
+
+        if self.refine and scale < 1.0 and boxes:
+            remaining = self.latency_budget - (time.perf_counter() - start)
+            boxes = [self._refine(rgb_image, box, remaining / min(len(boxes), self.max_refine_faces),
+                                  plan["refine_model"])
+                     if i < self.max_refine_faces else box
+                     for i, box in enumerate(boxes)]
+            boxes = non_max_suppression(boxes)
+
+        plan["seconds"] = round(time.perf_counter() - start, 3)
+        if verbose:
+            print(f"Detector: {plan['model']} at {plan['scale']:.2f}x (faces >= ~{plan['min_face_px']} px), "
+                  f"refined with {plan['refine_model'] if self.refine and scale < 1.0 else 'none'} "
+                  f"in {plan['seconds']:.2f}s")
+        return boxes
+
+    @staticmethod
+    def _clip(box, height, width):
+        top, right, bottom, left = box
+        return (max(0, top), min(width, right), min(height, bottom), max(0, left))
+
+    def _refine(self, rgb_image, box, time_per_face, model, target_face=150):
+        """Re-detects one face in a full-resolution crop; keeps the coarse box if nothing is found."""
+        height, width = rgb_image.shape[:2]
+        top, right, bottom, left = box
+        face_h, face_w = bottom - top, right - left
+        pad_y, pad_x = face_h // 2, face_w // 2
+        y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+        x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+        crop = rgb_image[y0:y1, x0:x1]
+
+        # Bring the face to ~target_face px: big faces are shrunk, small ones upsampled
+        crop_scale = target_face / max(1, max(face_h, face_w))
+        crop_scale = min(crop_scale, 2.0)
+        crop = cv2.resize(crop, (max(1, round(crop.shape[1] * crop_scale)), max(1, round(crop.shape[0] * crop_scale))))
+        sy, sx = crop.shape[0] / (y1 - y0), crop.shape[1] / (x1 - x0)
+
+        if model == "hog" and crop.shape[0] * crop.shape[1] / self.cnn_rate <= time_per_face:
+            model = "cnn"  # the crop is small enough for the accurate detector
+        try:
+            found = face_recognition.face_locations(np.ascontiguousarray(crop), number_of_times_to_upsample=0,
+                                                    model=model)
+        except Exception:
+            found = face_recognition.face_locations(np.ascontiguousarray(crop), number_of_times_to_upsample=0,
+                                                    model="hog")
+        if not found:
+            return box
+
+        mapped = [(y0 + int(round(t / sy)), x0 + int(round(r / sx)), y0 + int(round(b / sy)), x0 + int(round(l / sx)))
+                  for (t, r, b, l) in found]
+        # Several faces in one crop: keep the one that overlaps the candidate most
+        best = max(mapped, key=lambda m: box_iou(m, box))
+        return self._clip(best, height, width) if box_iou(best, box) > 0.2 else box
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import face_recognition
+import numpy as np
+
+# ==========================================
+# FACE ENCODING CACHE
+# ==========================================
+# face_encodings is the most expensive step after detection, and the same
+# photos keep coming back (re-runs, thumbnails, copies in output/). This cache
+# maps an exact hash of each face crop to its 128-d encoding:
+#   - memory tier: LRU bounded by max_entries
+#   - disk tier (opt-in): one .npy per key under disk_dir, shared across runs
+#     and processes, bounded by max_disk_entries (least recently used files
+#     are deleted first). Off unless disk_dir or FACE_ENCODING_CACHE_DIR is set.
+#
+# The crop includes a 50% margin around the box, because dlib's landmark
+# model and face chip look slightly outside the detected box. Identical
+# pixels around the same relative box always give the same encoding.
+
+DEFAULT_DISK_DIR = os.environ.get("FACE_ENCODING_CACHE_DIR") or None
+
+
+class EncodingCache:
+    def __init__(self, max_entries=10_000, disk_dir=DEFAULT_DISK_DIR, max_disk_entries=100_000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries  # ~1.2 KB per file
+        self._disk_count = None                   # files on disk, counted on the first put
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- keys ---
+
+    @staticmethod
+    def face_key(rgb_image, box, margin=0.5):
+        """Hash of the face crop (plus margin) and the box's position inside it."""
+        top, right, bottom, left = box
+        height, width = rgb_image.shape[:2]
+        pad_y, pad_x = int((bottom - top) * margin), int((right - left) * margin)
+        y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+        x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+        crop = np.ascontiguousarray(rgb_image[y0:y1, x0:x1])
+        digest = hashlib.blake2b(crop.tobytes(), digest_size=20)
+        digest.update(np.array([top - y0, right - x0, bottom - y0, left - x0, *crop.shape], dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_key(path):
+        """Hash of a whole image file (for enrollment photos: first face in the file)."""
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"first-face")
+        return digest.hexdigest()
+
+    # --- tiers ---
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".npy")
+
+    def get(self, key):
+        with self._lock:
+            encoding = self._memory.get(key)
+            if encoding is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return encoding
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                encoding = np.load(path)
+            except (OSError, ValueError):
+                encoding = None
+            if encoding is not None:
+                try:
+                    os.utime(path)  # mtime = last use, for pruning
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, encoding)
+                return encoding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key, encoding):
+        with self._lock:
+            self._memory[key] = encoding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, key, encoding):
+        encoding = np.asarray(encoding, dtype=np.float64)
+        self._remember(key, encoding)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, encoding)
+            os.replace(tmp, path)
+            with self._lock:
+                if self._disk_count is None:
+                    self._disk_count = len(self._disk_files())
+                self._disk_count += 1
+                full = self._disk_count > self.max_disk_entries
+            if full:
+                self._prune_disk()
+
+    def _disk_files(self):
+        """(mtime_ns, path) of every encoding file in the disk tier."""
+        files = []
+        if not os.path.isdir(self.disk_dir):
+            return files
+        for folder in os.scandir(self.disk_dir):
+            if folder.is_dir():
+                for entry in os.scandir(folder.path):
+                    if entry.name.endswith(".npy"):
+                        try:
+                            files.append((entry.stat().st_mtime_ns, entry.path))
+                        except OSError:
+                            pass  # deleted by another process meanwhile
+        return files
+
+    def _prune_disk(self):
+        """Deletes the least recently used files until the disk tier is at 90% of max_disk_entries."""
+        files = sorted(self._disk_files())
+        excess = max(0, len(files) - int(self.max_disk_entries * 0.9))
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_count = len(files) - excess
+
+    # --- encoding helpers ---
+
+    def face_encodings(self, rgb_image, face_locations):
+        """Drop-in for face_recognition.face_encodings that only encodes uncached faces."""
+        keys = [self.face_key(rgb_image, box) for box in face_locations]
+        encodings = [self.get(key) for key in keys]
+        missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+        if missing:
+            fresh = face_recognition.face_encodings(rgb_image, [face_locations[i] for i in missing])
+            for i, encoding in zip(missing, fresh):
+                self.put(keys[i], encoding)
+                encodings[i] = encoding
+        return encodings
+
+    def encode_file(self, path, encode_fn):
+        """Cached encode_fn(path) for enrollment images (None results are not cached)."""
+        key = self.file_key(path)
+        encoding = self.get(key)
+        if encoding is None:
+            encoding = encode_fn(path)
+            if encoding is not None:
+                self.put(key, encoding)
+        return encoding
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "entries": len(self._memory),
+        }
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# ==========================================
+# PERSISTENT FACE-ENCODING STORE
+# ==========================================
+# Encoding every image in known_faces/ on each start is slow once there are
+# thousands of people enrolled. The store keeps the 128-d encodings in a
+# float32 .npy file (memory-mapped on load) next to an index.json that maps
+# each source file to its row, keyed by mtime, size and content hash.
+# Only added or changed files are re-encoded; deleted files are dropped.
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+ENCODING_SIZE = 128
+STORE_VERSION = 1
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """Returns the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingStore:
+    def __init__(self, faces_dir, store_dir=None):
+        self.faces_dir = faces_dir
+        self.store_dir = store_dir or os.path.join(faces_dir, ".encodings")
+        self.encodings_path = os.path.join(self.store_dir, "encodings.npy")
+        self.index_path = os.path.join(self.store_dir, "index.json")
+
+    def signature(self):
+        """Fingerprint of the current store contents (changes whenever sync rewrites it)."""
+        if not os.path.exists(self.index_path):
+            return None
+        return file_sha1(self.index_path)
+
+    def row_keys(self):
+        """A 'sha1:file' key per encoding row, in row order; identifies rows across syncs."""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("entries", [])
+        rows = sorted((e for e in entries if e["row"] >= 0), key=lambda e: e["row"])
+        return [f"{e['sha1']}:{e['file']}" for e in rows]
+
+    def _load(self):
+        """Returns (entries, encodings) from disk, or empty ones if missing/stale."""
+        empty = ([], np.zeros((0, ENCODING_SIZE), dtype=np.float32))
+        if not (os.path.exists(self.index_path) and os.path.exists(self.encodings_path)):
+            return empty
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            encodings = np.load(self.encodings_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Encoding store is unreadable ({e}), rebuilding...")
+            return empty
+
+        if index.get("version") != STORE_VERSION or encodings.shape[1:] != (ENCODING_SIZE,):
+            return empty
+        return index["entries"], encodings
+
+    def _save(self, entries, encodings):
+        """Writes the index and encodings atomically (temp file + rename)."""
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        tmp_encodings = self.encodings_path + ".tmp"
+        with open(tmp_encodings, "wb") as f:
+            np.save(f, np.ascontiguousarray(encodings, dtype=np.float32))
+        os.replace(tmp_encodings, self.encodings_path)
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "entries": entries}, f)
+        os.replace(tmp_index, self.index_path)
+
+    def sync(self, encode_fn):
+        """Brings the store up to date with faces_dir.
+
+        encode_fn(path) must return a 128-d encoding, or None when the image
+        has no face. Returns (encodings, names) where encodings is an (N, 128)
+        float32 array (memory-mapped when nothing changed) and names[i] is the
+        person for row i.
+        """
+        old_entries, old_encodings = self._load()
+        by_file = {e["file"]: e for e in old_entries}
+        by_hash = {e["sha1"]: e for e in old_entries}
+
+        filenames = sorted(f for f in os.listdir(self.faces_dir) if f.endswith(IMAGE_EXTENSIONS))
+
+        entries = []
+        rows = []          # row in old_encodings, or an encoding computed now
+        changed = len(filenames) != len(old_entries)
+        encoded = 0
+
+        for filename in filenames:
+            path = os.path.join(self.faces_dir, filename)
+            st = os.stat(path)
+            entry = by_file.get(filename)
+
+            # Fast path: same file, untouched since we last saw it
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                entries.append(entry)
+                rows.append(entry["row"])
+                continue
+
+            # Touched or renamed: only re-encode if the contents really changed
+            sha1 = file_sha1(path)
+            known = by_hash.get(sha1)
+            changed = True
+            if known is not None:
+                row = known["row"]
+            else:
+                encoding = encode_fn(path)
+                encoded += 1
+                if encoding is None:
+                    print(f"No face found in {filename}, skipping.")
+                    row = -1
+                else:
+                    print(f"Loaded: {filename}")
+                    row = np.asarray(encoding, dtype=np.float32)
+
+            entries.append({
+                "file": filename,
+                "name": os.path.splitext(filename)[0],
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "sha1": sha1,
+                "row": -1,
+            })
+            rows.append(row)
+
+        # Warm start: every file hit the fast path, so the mapped array is current
+        if not changed:
+            return old_encodings, [e["name"] for e in entries if e["row"] != -1]
+
+        # Entries without a face keep row -1 so they are not retried every start
+        vectors = []
+        for entry, row in zip(entries, rows):
+            if isinstance(row, np.ndarray):
+                vector = row
+            elif row >= 0:
+                vector = np.array(old_encodings[row], dtype=np.float32)  # a copy, not a view of the map
+            else:
+                entry["row"] = -1
+                continue
+            entry["row"] = len(vectors)
+            vectors.append(vector)
+
+        if vectors:
+            encodings = np.stack(vectors).astype(np.float32, copy=False)
+        else:
+            encodings = np.zeros((0, ENCODING_SIZE), dtype=np.float32)
+        # encodings.npy is about to be replaced; Windows refuses while it is still mapped
+        del old_encodings, vectors
+        self._save(entries, encodings)
+        print(f"Encoding store updated: {encoded} encoded, {len(encodings)} face(s) total.")
+
+        encodings = np.load(self.encodings_path, mmap_mode="r")
+        names = [e["name"] for e in entries if e["row"] != -1]
+        return encodings, names
@@ -0,0 +1,318 @@
+import numpy as np
+
+# ==========================================
+# NEAREST-NEIGHBOUR INDEXES FOR LARGE GALLERIES
+# ==========================================
+# Both indexes store 128-d encodings under integer ids and share one API:
+#
+#   add(vectors, ids)   remove(ids)   search(queries, k) -> (distances, ids)
+#   remap_ids(mapping)  save(path)    load(path)    len(index)
+#
+# BruteForceIndex scans everything and is exact (right for small galleries).
+# IVFIndex clusters the gallery with k-means and only scans the `nprobe`
+# clusters closest to each query, which keeps per-face cost roughly flat as
+# the gallery grows past a million encodings.
+
+ENCODING_SIZE = 128
+
+
+class _VectorList:
+    """Growable (vectors, ids) storage with cached squared norms."""
+
+    def __init__(self, capacity=16):
+        self.vectors = np.empty((capacity, ENCODING_SIZE), dtype=np.float32)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, vectors, ids):
+        needed = self.size + len(vectors)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            for attr in ("vectors", "sq_norms", "ids"):
+                old = getattr(self, attr)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[: self.size] = old[: self.size]
+                setattr(self, attr, new)
+        end = self.size + len(vectors)
+        self.vectors[self.size:end] = vectors
+        self.sq_norms[self.size:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids[self.size:end] = ids
+        self.size = end
+
+    def remove(self, ids):
+        """Drops the given ids (compacting in place); returns how many were removed."""
+        keep = ~np.isin(self.ids[: self.size], ids)
+        kept = int(keep.sum())
+        removed = self.size - kept
+        if removed:
+            for attr in ("vectors", "sq_norms", "ids"):
+                arr = getattr(self, attr)
+                arr[:kept] = arr[: self.size][keep]
+            self.size = kept
+        return removed
+
+    def remap(self, mapping):
+        self.ids[: self.size] = mapping[self.ids[: self.size]]
+
+    def distances(self, query, query_sq):
+        sq = query_sq + self.sq_norms[: self.size] - 2.0 * (self.vectors[: self.size] @ query)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+
+def _as_vectors(vectors):
+    return np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+
+def _top_k(distances, ids, k):
+    """Returns the k smallest (distances, ids), sorted, padded with (inf, -1)."""
+    out_d = np.full(k, np.inf, dtype=np.float32)
+    out_i = np.full(k, -1, dtype=np.int64)
+    n = min(k, len(distances))
+    if n == 0:
+        return out_d, out_i
+    if n < len(distances):
+        part = np.argpartition(distances, n - 1)[:n]
+    else:
+        part = np.arange(len(distances))
+    part = part[np.argsort(distances[part])]
+    out_d[:n] = distances[part]
+    out_i[:n] = ids[part]
+    return out_d, out_i
+
+
+class BruteForceIndex:
+    kind = "brute"
+
+    def __init__(self):
+        self._store = _VectorList()
+
+    def __len__(self):
+        return self._store.size
+
+    def add(self, vectors, ids):
+        vectors = _as_vectors(vectors)
+        self._store.append(vectors, np.asarray(ids, dtype=np.int64))
+
+    def remove(self, ids):
+        return self._store.remove(np.asarray(ids, dtype=np.int64))
+
+    def remap_ids(self, mapping):
+        """Renames every id i to mapping[i] (an int array indexed by old id)."""
+        self._store.remap(np.asarray(mapping, dtype=np.int64))
+
+    def search(self, queries, k=1):
+        queries = _as_vectors(queries)
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        store = self._store
+        for qi, query in enumerate(queries):
+            dist = store.distances(query, float(query @ query))
+            distances[qi], ids[qi] = _top_k(dist, store.ids[: store.size], k)
+        return distances, ids
+
+    def save(self, path):
+        store = self._store
+        np.savez(path, kind=self.kind, vectors=store.vectors[: store.size], ids=store.ids[: store.size])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls._from_npz(data)
+
+    @classmethod
+    def _from_npz(cls, data):
+        index = cls()
+        index.add(data["vectors"], data["ids"])
+        return index
+
+
+def kmeans(vectors, num_clusters, iterations=10, sample_size=100_000, seed=0):
+    """Plain Lloyd's k-means on a random sample; returns (num_clusters, 128) centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    vectors = _as_vectors(vectors)
+    num_clusters = min(num_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = _nearest_centroid(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=num_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random points so no list stays unused
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+def _centroid_distances(vectors, centroids):
+    """Squared distances (up to a per-row constant) from vectors to centroids."""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    return c_sq[None, :] - 2.0 * (vectors @ centroids.T)
+
+
+def _nearest_centroid(vectors, centroids, chunk_size=65_536):
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        block = vectors[start:start + chunk_size]
+        assign[start:start + len(block)] = np.argmin(_centroid_distances(block, centroids), axis=1)
+    return assign
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer + one vector list per cluster.
+
+    add/remove never move the centroids. trained_size is the gallery size they
+    were trained on and updates counts vectors added or removed since, so the
+    owner can retrain (rebuild) once needs_retraining() says the lists drifted.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, centroids, nprobe=8, trained_size=0):
+        self.centroids = _as_vectors(centroids)
+        self.nprobe = nprobe
+        self.trained_size = trained_size
+        self.updates = 0
+        self._lists = [_VectorList() for _ in range(len(self.centroids))]
+        self._id_to_list = {}
+
+    @classmethod
+    def build(cls, vectors, ids, num_lists=None, nprobe=8):
+        """Trains centroids on `vectors` and adds them; num_lists defaults to ~sqrt(N)."""
+        vectors = _as_vectors(vectors)
+        if num_lists is None:
+            num_lists = max(1, int(np.sqrt(len(vectors))))
+        index = cls(kmeans(vectors, num_lists), nprobe=nprobe, trained_size=len(vectors))
+        index.add(vectors, ids)
+        index.updates = 0
+        return index
+
+    def __len__(self):
+        return len(self._id_to_list)
+
+    def add(self, vectors, ids):
+        vectors = _as_vectors(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        # Re-adding an id replaces its old vector
+        existing = [i for i in ids.tolist() if i in self._id_to_list]
+        if existing:
+            self.remove(existing)
+        assign = _nearest_centroid(vectors, self.centroids)
+        for list_no in np.unique(assign):
+            rows = np.flatnonzero(assign == list_no)
+            self._lists[list_no].append(vectors[rows], ids[rows])
+        self._id_to_list.update(zip(ids.tolist(), assign.tolist()))
+        self.updates += len(ids)
+
+    def remove(self, ids):
+        by_list = {}
+        for i in np.asarray(ids, dtype=np.int64).tolist():
+            list_no = self._id_to_list.pop(i, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(i)
+        removed = sum(self._lists[list_no].remove(np.asarray(list_ids, dtype=np.int64))
+                      for list_no, list_ids in by_list.items())
+        self.updates += removed
+        return removed
+
+    def remap_ids(self, mapping):
+        """Renames every id i to mapping[i] (an int array indexed by old id)."""
+        mapping = np.asarray(mapping, dtype=np.int64)
+        for vlist in self._lists:
+            vlist.remap(mapping)
+        self._id_to_list = {int(mapping[i]): list_no for i, list_no in self._id_to_list.items()}
+
+    def needs_retraining(self, max_drift=0.2):
+        """True once more than max_drift x trained_size vectors were added/removed since training."""
+        return self.updates > max_drift * max(self.trained_size, 1)
+
+    def search(self, queries, k=1, nprobe=None):
+        queries = _as_vectors(queries)
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        if len(queries) == 0:
+            return distances, ids
+
+        coarse = _centroid_distances(queries, self.centroids)
+        if nprobe < len(self._lists):
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(len(self._lists)), coarse.shape)
+
+        for qi, query in enumerate(queries):
+            query_sq = float(query @ query)
+            cand_d, cand_i = [], []
+            for list_no in probes[qi]:
+                vlist = self._lists[list_no]
+                if vlist.size:
+                    cand_d.append(vlist.distances(query, query_sq))
+                    cand_i.append(vlist.ids[: vlist.size])
+            if cand_d:
+                distances[qi], ids[qi] = _top_k(np.concatenate(cand_d), np.concatenate(cand_i), k)
+            else:
+                distances[qi], ids[qi] = _top_k(np.zeros(0, np.float32), np.zeros(0, np.int64), k)
+        return distances, ids
+
+    def save(self, path):
+        sizes = np.array([vlist.size for vlist in self._lists], dtype=np.int64)
+        vectors = [vlist.vectors[: vlist.size] for vlist in self._lists]
+        ids = [vlist.ids[: vlist.size] for vlist in self._lists]
+        np.savez(path, kind=self.kind, centroids=self.centroids, nprobe=self.nprobe, list_sizes=sizes,
+                 trained_size=self.trained_size, updates=self.updates,
+                 vectors=np.concatenate(vectors) if vectors else np.zeros((0, ENCODING_SIZE), np.float32),
+                 ids=np.concatenate(ids) if ids else np.zeros(0, np.int64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls._from_npz(data)
+
+    @classmethod
+    def _from_npz(cls, data):
+        # Indexes saved before drift tracking count as trained on what they hold
+        trained_size = int(data["trained_size"]) if "trained_size" in data.files else int(data["list_sizes"].sum())
+        index = cls(data["centroids"], nprobe=int(data["nprobe"]), trained_size=trained_size)
+        vectors, ids = data["vectors"], data["ids"]
+        offsets = np.r_[0, np.cumsum(data["list_sizes"])]
+        for list_no, vlist in enumerate(index._lists):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            if end > start:
+                vlist.append(vectors[start:end], ids[start:end])
+                index._id_to_list.update(dict.fromkeys(ids[start:end].tolist(), list_no))
+        index.updates = int(data["updates"]) if "updates" in data.files else 0
+        return index
+
+
+INDEX_TYPES = {BruteForceIndex.kind: BruteForceIndex, IVFIndex.kind: IVFIndex}
+
+# Below this many encodings an exact scan is fast enough and needs no training
+IVF_THRESHOLD = 50_000
+
+
+def build_index(vectors, backend="auto", nprobe=8):
+    """Builds an index over `vectors` with ids 0..N-1 ('auto', 'brute' or 'ivf')."""
+    vectors = _as_vectors(vectors)
+    if backend == "auto":
+        backend = "ivf" if len(vectors) >= IVF_THRESHOLD else "brute"
+    ids = np.arange(len(vectors), dtype=np.int64)
+    if backend == "ivf":
+        return IVFIndex.build(vectors, ids, nprobe=nprobe)
+    if backend == "brute":
+        index = BruteForceIndex()
+        index.add(vectors, ids)
+        return index
+    raise ValueError(f"Unknown index backend: {backend!r}")
+
+
+def load_index(path):
+    """Loads an index saved by BruteForceIndex.save or IVFIndex.save."""
+    with np.load(path) as data:
+        return INDEX_TYPES[str(data["kind"])]._from_npz(data)
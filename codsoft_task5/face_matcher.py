@@ -0,0 +1,170 @@
+import numpy as np
+
+# ==========================================
+# VECTORIZED FACE MATCHER
+# ==========================================
+# face_recognition.compare_faces + face_distance scan the whole gallery twice
+# for every detected face. FaceMatcher keeps the gallery as one contiguous
+# float32 matrix and matches a whole frame's faces at once:
+#
+#   ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g      (the q.g part is one BLAS call)
+#
+# An identity may have several encodings (e.g. yuvedha.jpg and yuvedha__2.jpg);
+# their distances are reduced per identity with min or mean.
+#
+# For very large galleries an approximate index from face_index.py can be
+# plugged in; the matcher then only scores the candidates it returns.
+
+UNKNOWN_NAME = "Unknown"
+DEFAULT_TOLERANCE = 0.6  # same default as face_recognition.compare_faces
+
+
+def identity_name(stem):
+    """Maps an enrollment file stem to a person: 'yuvedha__2' -> 'yuvedha'."""
+    return stem.split("__", 1)[0]
+
+
+class MatchResult:
+    """Recognition result for one face, shared by the image, webcam and batch paths."""
+
+    def __init__(self, name=UNKNOWN_NAME, distance=None, identity=-1, top_k=None):
+        self.name = name            # best identity, or "Unknown" if outside tolerance
+        self.distance = distance    # distance to the best identity (None: empty gallery)
+        self.identity = identity    # index into FaceMatcher.names, -1 if unknown
+        self.top_k = top_k or []    # [(name, distance), ...] closest identities first
+
+    @property
+    def is_known(self):
+        return self.identity >= 0
+
+    def __repr__(self):
+        return f"MatchResult(name={self.name!r}, distance={self.distance})"
+
+
+class FaceMatcher:
+    def __init__(self, encodings, names, aggregation="min", index=None):
+        if aggregation not in ("min", "mean"):
+            raise ValueError(f"aggregation must be 'min' or 'mean', got {aggregation!r}")
+        if index is not None and aggregation != "min":
+            raise ValueError("an approximate index only supports 'min' aggregation")
+        self.aggregation = aggregation
+
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+
+        # One id per distinct name, in first-seen order
+        self.names = []
+        name_to_id = {}
+        ids = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            if name not in name_to_id:
+                name_to_id[name] = len(self.names)
+                self.names.append(name)
+            ids[i] = name_to_id[name]
+
+        # With an index (built over rows 0..N-1 of `encodings`) the gallery matrix
+        # is not needed; candidates are mapped back to identities through row_ids
+        self.index = index
+        self.row_ids = ids
+        if index is not None:
+            encodings = np.zeros((0, 128), dtype=np.float32)
+            ids = ids[:0]
+        else:
+            encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+
+        # Sort rows by identity so each identity is one contiguous column range
+        order = np.argsort(ids, kind="stable")
+        if np.array_equal(order, np.arange(len(order))):
+            self.gallery = np.ascontiguousarray(encodings)  # already grouped: no copy
+        else:
+            self.gallery = np.ascontiguousarray(encodings[order])
+        self.gallery_sq = np.einsum("ij,ij->i", self.gallery, self.gallery)
+        sorted_ids = ids[order]
+        self.group_starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) \
+            if len(sorted_ids) else np.zeros(0, dtype=np.int64)
+        self.group_sizes = np.diff(np.r_[self.group_starts, len(sorted_ids)])
+        self.one_per_identity = len(self.group_starts) == len(self.gallery)
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, face_encodings):
+        """Returns the (N faces x M identities) Euclidean distance matrix."""
+        if self.index is not None:
+            raise ValueError("distances() needs the full gallery, which a matcher with an index does not keep; "
+                             "use match()")
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+        if len(queries) == 0 or len(self.gallery) == 0:
+            return np.zeros((len(queries), len(self.names)), dtype=np.float32)
+
+        query_sq = np.einsum("ij,ij->i", queries, queries)
+        sq = query_sq[:, None] + self.gallery_sq[None, :] - 2.0 * (queries @ self.gallery.T)
+        np.maximum(sq, 0.0, out=sq)  # float32 rounding can dip just below zero
+        dist = np.sqrt(sq, out=sq)
+
+        if self.one_per_identity:
+            return dist
+        if self.aggregation == "min":
+            return np.minimum.reduceat(dist, self.group_starts, axis=1)
+        return np.add.reduceat(dist, self.group_starts, axis=1) / self.group_sizes
+
+    def match(self, face_encodings, tolerance=DEFAULT_TOLERANCE, top_k=1):
+        """Matches every face of a frame in one pass; returns a MatchResult per face."""
+        num_faces = len(face_encodings)
+        if len(self.names) == 0:
+            return [MatchResult() for _ in range(num_faces)]
+        if num_faces == 0:
+            return []
+
+        if self.index is not None:
+            return self._match_with_index(face_encodings, tolerance, top_k)
+
+        dist = self.distances(face_encodings)
+        k = max(1, min(top_k, dist.shape[1]))
+        if k < dist.shape[1]:
+            candidates = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+        candidate_dist = np.take_along_axis(dist, candidates, axis=1)
+        order = np.argsort(candidate_dist, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_dist = np.take_along_axis(candidate_dist, order, axis=1)
+
+        results = []
+        for ids, ds in zip(candidates.tolist(), candidate_dist.tolist()):
+            top = [(self.names[i], d) for i, d in zip(ids, ds)]
+            best_id, best_dist = ids[0], ds[0]
+            if best_dist <= tolerance:
+                results.append(MatchResult(self.names[best_id], best_dist, best_id, top))
+            else:
+                results.append(MatchResult(UNKNOWN_NAME, best_dist, -1, top))
+        return results
+
+    def _match_with_index(self, face_encodings, tolerance, top_k, oversample=4):
+        """Top-k identities from the index's candidate rows (first hit per identity wins)."""
+        top_k = max(1, min(top_k, len(self.names)))
+        row_dist, rows = self.index.search(face_encodings, k=top_k * oversample)
+
+        results = []
+        for ds, rs in zip(row_dist.tolist(), rows.tolist()):
+            top = []
+            seen = set()
+            for d, r in zip(ds, rs):
+                if r < 0:
+                    break
+                identity = int(self.row_ids[r])
+                if identity not in seen:
+                    seen.add(identity)
+                    top.append((identity, d))
+                    if len(top) == top_k:
+                        break
+            if not top:
+                results.append(MatchResult())
+                continue
+            named = [(self.names[i], d) for i, d in top]
+            best_id, best_dist = top[0]
+            if best_dist <= tolerance:
+                results.append(MatchResult(self.names[best_id], best_dist, best_id, named))
+            else:
+                results.append(MatchResult(UNKNOWN_NAME, best_dist, -1, named))
+        return results
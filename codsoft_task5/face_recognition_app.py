@@ -1,147 +1,221 @@
 import cv2
 import face_recognition
+import json
 import os
+import time
 import numpy as np
 
+from annotation_renderer import AnnotationRenderer, text_size
+from detection_strategy import DetectionStrategy, legacy_detect
+from encoding_cache import DEFAULT_DISK_DIR, EncodingCache
+from encoding_store import EncodingStore
+from face_index import IVF_THRESHOLD, build_index, load_index
+from face_matcher import FaceMatcher, identity_name
+from face_tracker import FaceTracker
+from video_pipeline import FramePipeline, format_report
+
 class FaceRecognitionApp:
-    def __init__(self, known_faces_dir="known_faces"):
+    def __init__(self, known_faces_dir="known_faces", index_backend="auto", adaptive_detection=True,
+                 detection_budget=3.0, encoding_cache_dir=DEFAULT_DISK_DIR):
+        # index_backend: 'brute' (exact scan), 'ivf' (approximate, for huge galleries)
+        # or 'auto' (ivf once the gallery reaches IVF_THRESHOLD encodings)
+        # detection_budget: target seconds for still-image detection (adaptive mode)
+        # encoding_cache_dir: opt-in disk tier for cached face encodings (None: memory only)
         self.known_faces_dir = known_faces_dir
+        self.index_backend = index_backend
+        self.detection_strategy = DetectionStrategy(detection_budget) if adaptive_detection else None
+        self.encoding_cache = EncodingCache(disk_dir=encoding_cache_dir)
+        self.renderer = AnnotationRenderer()
         self.known_face_encodings = []
         self.known_face_names = []
         self.load_known_faces()
 
+    @staticmethod
+    def encode_known_face(path):
+        """Encodes the first face in an enrollment image (None if no face)."""
+        image = face_recognition.load_image_file(path)
+        # Get the face encoding (assuming one face per image)
+        encodings = face_recognition.face_encodings(image)
+        return encodings[0] if len(encodings) > 0 else None
+
     def load_known_faces(self):
-        """Loads images from known_faces_dir and encodes them."""
+        """Loads known faces, re-encoding only images added or changed since the last run."""
+        # Called again on hot reload while requests are served: the current
+        # gallery stays live until the new one is complete, then is swapped in
         print("Loading known faces...")
+        store = None
+        encodings, names = np.zeros((0, 128), dtype=np.float32), []
         if not os.path.exists(self.known_faces_dir):
             os.makedirs(self.known_faces_dir)
             print(f"Created directory: {self.known_faces_dir}")
-            return
-
-        for filename in os.listdir(self.known_faces_dir):
-            if filename.endswith((".jpg", ".png", ".jpeg")):
-                path = os.path.join(self.known_faces_dir, filename)
-                image = face_recognition.load_image_file(path)
-                
-                # Get the face encoding (assuming one face per image)
-                encodings = face_recognition.face_encodings(image)
-                if len(encodings) > 0:
-                    self.known_face_encodings.append(encodings[0])
-                    # Use filename without extension as the name
-                    self.known_face_names.append(os.path.splitext(filename)[0])
-                    print(f"Loaded: {filename}")
-                else:
-                    print(f"No face found in {filename}, skipping.")
+        else:
+            # Encodings are cached in known_faces/.encodings (see encoding_store.py)
+            store = EncodingStore(self.known_faces_dir)
+            encodings, names = store.sync(
+                lambda path: self.encoding_cache.encode_file(path, self.encode_known_face))
+            # Own copy, not a view of the memory map: a later sync must be able to
+            # replace encodings.npy while this gallery is still serving
+            encodings = np.array(encodings, dtype=np.float32)
+
+        index = None
+        use_ivf = self.index_backend == "ivf" or (
+            self.index_backend == "auto" and len(names) >= IVF_THRESHOLD)
+        if use_ivf and len(names) > 0:
+            index = self._load_ivf_index(store, encodings)
+
+        # Several images of one person (yuvedha.jpg, yuvedha__2.jpg) form one identity
+        matcher = FaceMatcher(encodings, [identity_name(n) for n in names], index=index)
+        self.known_face_encodings, self.known_face_names, self.matcher = encodings, names, matcher
+        print(f"{len(matcher)} known person(s) ready.")
+
+    def _load_ivf_index(self, store, encodings, max_drift=0.2):
+        """Loads the saved IVF index and applies the encoding store's changes to it.
+
+        Rows added to or dropped from the store since the index was saved are
+        added/removed in place; k-means is only re-run once more than max_drift
+        of the trained gallery has changed (or there is no usable saved index).
+        """
+        index_path = os.path.join(store.store_dir, "ivf_index.npz")
+        keys_path = index_path + ".keys.json"
+        keys = store.row_keys()
+
+        index = None
+        if os.path.exists(index_path) and os.path.exists(keys_path):
+            with open(keys_path, "r", encoding="utf-8") as f:
+                saved_keys = json.load(f)
+            index = load_index(index_path)
+            if index.kind != "ivf" or len(index) != len(saved_keys):
+                index = None
+
+        if index is not None and saved_keys != keys:
+            # Saved ids are rows of the old store; move the survivors to their new rows
+            new_row = {key: row for row, key in enumerate(keys)}
+            mapping = np.array([new_row.get(key, -1) for key in saved_keys], dtype=np.int64)
+            index.remove(np.flatnonzero(mapping < 0))
+            index.remap_ids(mapping)
+            old_keys = set(saved_keys)
+            added = np.array([row for row, key in enumerate(keys) if key not in old_keys], dtype=np.int64)
+            if len(added):
+                index.add(encodings[added], added)
+            print(f"IVF index updated: {int((mapping < 0).sum())} removed, {len(added)} added.")
+            if index.needs_retraining(max_drift):
+                print("IVF clusters drifted too far from the gallery, retraining...")
+                index = None
+        elif index is not None:
+            return index
+
+        if index is None:
+            print(f"Building IVF index over {len(encodings)} encodings...")
+            index = build_index(encodings, backend="ivf")
+        # No keys file means "rebuild", so a crash while saving can't pair new keys with an old index
+        if os.path.exists(keys_path):
+            os.remove(keys_path)
+        index.save(index_path)
+        with open(keys_path, "w", encoding="utf-8") as f:
+            json.dump(keys, f)
+        return index
+
+    def detect_image_faces(self, rgb_image, verbose=False):
+        """Face boxes for a still image.
+
+        By default the detector and working resolution are chosen per image to fit
+        detection_budget (see detection_strategy.py). With adaptive_detection=False
+        it is the original full-resolution CNN with a 2x-upsampled HOG fallback.
+        """
+        if self.detection_strategy is None:
+            return legacy_detect(rgb_image, verbose=verbose)
+        return self.detection_strategy.detect(rgb_image, verbose=verbose)
+
+    def detect_and_encode(self, image, verbose=False):
+        """Detects and encodes faces in a BGR image; returns (face_locations, face_encodings)."""
+        # Convert to RGB
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        face_locations = self.detect_image_faces(rgb_image, verbose=verbose)
+        # Faces seen before (re-runs, duplicates) come straight from the encoding cache
+        return face_locations, self.encoding_cache.face_encodings(rgb_image, face_locations)
+
+    def _recognize_image(self, image, tolerance=0.5, verbose=False):
+        """Detects, encodes and matches faces in a BGR image; returns (face_locations, match_results)."""
+        face_locations, face_encodings = self.detect_and_encode(image, verbose=verbose)
+
+        # Stricter recognition logic (Tolerance=0.5 instead of default 0.6)
+        # Lower number = stricter AI (less likely to make false matches)
+        # All faces are matched against the gallery in a single pass
+        return face_locations, self.matcher.match(face_encodings, tolerance=tolerance)
+
+    def recognize_image(self, image, annotate=False, jpeg_quality=90, tolerance=0.5):
+        """Headless recognition API: no console I/O, no windows and nothing written to disk
+        (unless the app was given an encoding_cache_dir).
+
+        image is a decoded BGR ndarray or encoded image bytes (JPEG/PNG/...).
+        Returns a dict with the faces (box, name, distance), counts, timings and,
+        when annotate=True, the annotated image as JPEG bytes.
+        """
+        start = time.perf_counter()
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("Could not decode image bytes")
+        elif not isinstance(image, np.ndarray) or image.ndim != 3:
+            raise TypeError("image must be a BGR ndarray or encoded image bytes")
+        decoded = time.perf_counter()
+
+        face_locations, match_results = self._recognize_image(image, tolerance=tolerance)
+        recognized = time.perf_counter()
+
+        faces = [{"box": [int(v) for v in box], "name": match.name, "distance": match.distance}
+                 for box, match in zip(face_locations, match_results)]
+        result = {
+            "faces": faces,
+            "num_faces": len(faces),
+            "known": sum(1 for match in match_results if match.is_known),
+            "unknown": sum(1 for match in match_results if not match.is_known),
+            "annotated_jpeg": None,
+            "encoding_cache": self.encoding_cache.stats(),
+        }
+        if annotate:
+            annotated = self.annotate_image(image, face_locations, match_results)
+            ok, jpeg = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            result["annotated_jpeg"] = jpeg.tobytes() if ok else None
+
+        result["timings_ms"] = {
+            "decode": round(1000 * (decoded - start), 2),
+            "recognize": round(1000 * (recognized - decoded), 2),
+            "total": round(1000 * (time.perf_counter() - start), 2),
+        }
+        return result
+
+    def annotate_image(self, image, face_locations, match_results, in_place=False):
+        """Returns the annotated image (padded, with a summary banner, for groups).
+
+        Drawing happens in annotation_renderer.py: group photos are padded into a
+        canvas reused by the next call on this thread (encode or save it first),
+        and with in_place=True single faces are drawn straight onto `image`.
+        """
+        return self.renderer.render(image, face_locations, match_results, in_place=in_place)
 
     def run_on_image(self, image_path):
-        """Detects and recognizes faces in a single image."""
+        """Detects and recognizes faces in a single image (interactive: asks, saves and shows)."""
         image = cv2.imread(image_path)
         if image is None:
             print(f"Could not read image: {image_path}")
             return
 
-        # Convert to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        print(f"Scanning image using Deep Learning (CNN) for maximum accuracy. Please wait...")
-        
-        try:
-            # Use CNN model - This is much more accurate for tilted/angled/small faces
-            # We use upsample=1 because the CNN model is already very powerful
-            face_locations = face_recognition.face_locations(rgb_image, number_of_times_to_upsample=1, model="cnn")
-        except Exception as e:
-            print("CNN model failed or too slow, falling back to enhanced HOG...")
-            face_locations = face_recognition.face_locations(rgb_image, number_of_times_to_upsample=2, model="hog")
-            
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+        if self.detection_strategy is None:
+            print(f"Scanning image using Deep Learning (CNN) for maximum accuracy. Please wait...")
+        else:
+            print(f"Scanning image (detector chosen for a {self.detection_strategy.latency_budget:.0f}s budget). Please wait...")
+        face_locations, match_results = self._recognize_image(image, verbose=True)
 
         num_faces = len(face_locations)
         print(f"Detected {num_faces} face(s) in the image.")
-        
-        # Horizontal Expansion for Group Photos (Canvas padding)
-        if num_faces > 1:
-            pad_w = int(image.shape[1] * 0.1) # 10% horizontal padding on each side
-            image = cv2.copyMakeBorder(image, 0, 0, pad_w, pad_w, cv2.BORDER_CONSTANT, value=(240, 240, 240))
-            # Offset face locations to account for new padding
-            new_face_locations = []
-            for (t, r, b, l) in face_locations:
-                new_face_locations.append((t, r + pad_w, b, l + pad_w))
-            face_locations = new_face_locations
-
-        known_count = 0
-        unknown_count = 0
-        identified_names = []
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            # Dynamic margins: Large enough for hair but restrained for groups to reduce overlap
-            height = bottom - top
-            width = right - left
-            
-            # 60% top margin (covers most hairstyles well without massive overlap in groups)
-            top = max(0, int(top - 0.6 * height))
-            bottom = min(image.shape[0], int(bottom + 0.15 * height))
-            left = max(0, int(left - 0.15 * width))
-            right = min(image.shape[1], int(right + 0.15 * width))
-
-            # Stricter recognition logic (Tolerance=0.5 instead of default 0.6)
-            # Lower number = stricter AI (less likely to make false matches)
-            tolerance = 0.5 
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=tolerance)
-            name = "Unknown"
-            color = (0, 0, 255) # Red for unknown
-
-            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                # If the best match distance is low enough AND matches is True
-                if matches[best_match_index] and face_distances[best_match_index] < tolerance:
-                    name = self.known_face_names[best_match_index]
-                    color = (0, 255, 0) # Green for known
-                    known_count += 1
-                    identified_names.append(name)
-                else:
-                    unknown_count += 1
-            else:
-                unknown_count += 1
-
-            # Improved Font Logic for Maximum Clarity
-            font = cv2.FONT_HERSHEY_TRIPLEX # Bolder and clearer than DUPLEX
-            # Force a slightly larger minimum size (0.55) so it's always readable
-            font_scale = max(0.55, min(1.0, width / 140)) 
-            thickness = 2 # Always use at least 2 for punchy, visible text
-            
-            (text_width, text_height), baseline = cv2.getTextSize(name, font, font_scale, thickness)
-            
-            # Ensure box width can fit name
-            if text_width + 10 > (right - left):
-                padding = (text_width + 10 - (right - left)) // 2
-                left = max(0, left - padding)
-                right = min(image.shape[1], right + padding)
-
-            # Draw thick head-targeted box
-            cv2.rectangle(image, (left, top), (right, bottom), color, 2)
-            
-            # Label background ABOVE the box (Exterior to not hide face)
-            label_padding = 18
-            label_h = text_height + label_padding
-            cv2.rectangle(image, (left, top - label_h), (right, top), color, cv2.FILLED)
-            
-            # Center text in the label
-            text_x = left + (right - left - text_width) // 2
-            text_y = top - (label_h - text_height) // 2
-            
-            # Draw a subtle black shadow first for maximum visibility
-            cv2.putText(image, name, (text_x + 1, text_y + 1), font, font_scale, (0, 0, 0), thickness)
-            # Draw the main white text
-            cv2.putText(image, name, (text_x, text_y), font, font_scale, (255, 255, 255), thickness)
-
-        if num_faces > 1:
-            # Add a summary banner at the top ONLY for group photos
-            banner_h = 50
-            cv2.rectangle(image, (0, 0), (image.shape[1], banner_h), (50, 50, 50), cv2.FILLED)
-            summary_text = f"Total: {num_faces} | Known: {known_count} | Unknown: {unknown_count}"
-            cv2.putText(image, summary_text, (20, 35), cv2.FONT_HERSHEY_TRIPLEX, 0.8, (255, 255, 255), 1)
 
+        # The image was read just for this call, so it can be drawn on directly
+        image = self.annotate_image(image, face_locations, match_results, in_place=True)
+
+        identified_names = [match.name for match in match_results if match.is_known]
+        known_count = len(identified_names)
+        unknown_count = num_faces - known_count
         print(f"Summary: {known_count} identified, {unknown_count} unknown.")
         if identified_names:
             print(f"People found: {', '.join(identified_names)}")
@@ -169,13 +243,8 @@ class FaceRecognitionApp:
         print(f"Success! Saved as: {output_filename}")
 
         # Show result - enlarged for groups to ensure clarity
-        display_img = image.copy()
-        # Much larger display limit for groups (1400x900)
-        max_view_w, max_view_h = 1400, 900
-        h, w = display_img.shape[:2]
-        if w > max_view_w or h > max_view_h:
-            scaling = min(max_view_w/w, max_view_h/h)
-            display_img = cv2.resize(display_img, (int(w * scaling), int(h * scaling)))
+        # Much larger display limit for groups (1400x900); resized only if it doesn't fit
+        display_img = self.renderer.display_view(image, 1400, 900)
 
         window_title = 'Group Recognition Result' if num_faces > 1 else 'Face Recognition Result'
         print("Showing image window. Close the window or press any key to continue...")
@@ -183,109 +252,161 @@ class FaceRecognitionApp:
         cv2.waitKey(0)
         cv2.destroyAllWindows()
 
-    def run_on_webcam(self):
-        """Real-time face recognition via webcam."""
-        video_capture = cv2.VideoCapture(0)
-
+    def recognize_frame(self, frame):
+        """Detects and recognizes faces in a video frame; returns [(box, MatchResult)].
+
+        Boxes are (top, right, bottom, left) in full-frame coordinates.
+        """
+        # Resize frame for faster processing
+        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+        # Find all faces and encodings
+        # For webcam, we keep upsample=1 to maintain real-time speed
+        face_locations = face_recognition.face_locations(rgb_small_frame, number_of_times_to_upsample=1)
+        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+
+        match_results = self.matcher.match(face_encodings)
+        return [((top * 4, right * 4, bottom * 4, left * 4), match)
+                for (top, right, bottom, left), match in zip(face_locations, match_results)]
+
+    @staticmethod
+    def detect_video_faces(frame):
+        """Detection half of recognize_frame (used by the tracker on detect frames)."""
+        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        face_locations = face_recognition.face_locations(rgb_small_frame, number_of_times_to_upsample=1)
+        return [(top * 4, right * 4, bottom * 4, left * 4) for (top, right, bottom, left) in face_locations]
+
+    def recognize_video_faces(self, frame, boxes):
+        """Recognition half of recognize_frame: encodes the given full-frame boxes."""
+        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        small_boxes = [(top // 4, right // 4, bottom // 4, left // 4) for (top, right, bottom, left) in boxes]
+        face_encodings = face_recognition.face_encodings(rgb_small_frame, small_boxes)
+        return self.matcher.match(face_encodings)
+
+    @staticmethod
+    def draw_video_faces(frame, faces):
+        """Draws head boxes, name labels and corner marks for recognize_frame results."""
+        for (top, right, bottom, left), match in faces:
+            # Full head coverage margins
+            h = bottom - top
+            w = right - left
+            top = max(0, int(top - 0.6 * h))
+            bottom = min(frame.shape[0], int(bottom + 0.3 * h))
+            left = max(0, int(left - 0.2 * w))
+            right = min(frame.shape[1], int(right + 0.2 * w))
+
+            name = match.name
+            color = (0, 255, 0) if match.is_known else (0, 0, 255)
+            
+            # Ensure width fits name
+            font = cv2.FONT_HERSHEY_DUPLEX
+            font_scale = 0.8
+            thickness_text = 1
+            (text_width, text_height), baseline = text_size(name, font, font_scale, thickness_text)
+            if text_width + 20 > (right - left):
+                center_x = (left + right) // 2
+                half_w = (text_width + 20) // 2
+                left = max(0, center_x - half_w)
+                right = min(frame.shape[1], center_x + half_w)
+
+            # Draw the rectangle
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+            
+            # Label above the head
+            label_h = text_height + 15
+            cv2.rectangle(frame, (left, top - label_h), (right, top), color, cv2.FILLED)
+            cv2.putText(frame, name, (left + (right-left-text_width)//2, top - 6), font, font_scale, (255, 255, 255), thickness_text)
+
+            # Dynamic corners
+            line_length = min(w, h) // 4
+            cv2.line(frame, (left, top), (left + line_length, top), color, 3)
+            cv2.line(frame, (left, top), (left, top + line_length), color, 3)
+            cv2.line(frame, (right, bottom), (right - line_length, bottom), color, 3)
+            cv2.line(frame, (right, bottom), (right, bottom - line_length), color, 3)
+
+    @staticmethod
+    def save_snapshot(frame):
+        """Asks for a file name and saves the frame to output/."""
+        if not os.path.exists('output'):
+            os.makedirs('output')
+        
+        print("\n--- Snapshot Mode ---")
+        custom_name = input("Enter a name for this snapshot (or press Enter for timestamp): ").strip()
+        
+        if custom_name:
+            if not custom_name.lower().endswith('.jpg'):
+                custom_name += '.jpg'
+            filename = os.path.join("output", custom_name)
+        else:
+            import datetime
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"output/snapshot_{timestamp}.jpg"
+            
+        cv2.imwrite(filename, frame)
+        print(f"Snapshot saved to {filename}")
+        print("Continuing video feed...\n")
+
+    def show_video_frame(self, frame, window_title):
+        """Shows a frame and handles keys; returns False when the user wants to quit."""
+        cv2.imshow(window_title, frame)
+
+        # Check for 'q' key OR ESC OR window closure
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q') or key == 27:
+            print("Quitting via key press...")
+            return False
+        
+        # Press 's' to save snapshot
+        if key == ord('s'):
+            self.save_snapshot(frame)
+
+        # Check if window is still open
+        if cv2.getWindowProperty(window_title, cv2.WND_PROP_VISIBLE) < 1:
+            print("Window closed by user. Quitting...")
+            return False
+        return True
+
+    def run_on_webcam(self, source=0, threaded=False, num_workers=2, headless=False, max_frames=None,
+                      track_every=None):
+        """Real-time face recognition via webcam.
+
+        source can be a camera index, a video file path or a frame source with
+        read()/release(). threaded=True runs the capture/detect/render pipeline
+        from video_pipeline.py; headless=True skips the window (for servers and tests).
+        track_every=N detects and recognizes only every N frames and tracks faces
+        in between (see face_tracker.py).
+        """
+        if threaded and track_every:
+            raise ValueError("tracking needs frames in order; use it with threaded=False")
+
+        video_capture = cv2.VideoCapture(source) if isinstance(source, (int, str)) else source
+        window_title = 'Video Face Recognition (Press Q to quit)'
+
+        if threaded:
+            return self._run_webcam_pipeline(video_capture, window_title, num_workers, headless, max_frames)
+
+        tracker = None
+        if track_every:
+            tracker = FaceTracker(self.detect_video_faces, self.recognize_video_faces, detect_every=track_every)
+
+        frames = 0
         try:
-            while True:
+            while max_frames is None or frames < max_frames:
                 ret, frame = video_capture.read()
                 if not ret:
                     break
+                frames += 1
 
-                # Resize frame for faster processing
-                small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-                # Find all faces and encodings
-                # For webcam, we keep upsample=1 to maintain real-time speed
-                face_locations = face_recognition.face_locations(rgb_small_frame, number_of_times_to_upsample=1)
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-                for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                    top *= 4
-                    right *= 4
-                    bottom *= 4
-                    left *= 4
-
-                    # Full head coverage margins
-                    h = bottom - top
-                    w = right - left
-                    top = max(0, int(top - 0.6 * h))
-                    bottom = min(frame.shape[0], int(bottom + 0.3 * h))
-                    left = max(0, int(left - 0.2 * w))
-                    right = min(frame.shape[1], int(right + 0.2 * w))
-
-                    matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-                    name = "Unknown"
-
-                    face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                    if len(face_distances) > 0:
-                        best_match_index = np.argmin(face_distances)
-                        if matches[best_match_index]:
-                            name = self.known_face_names[best_match_index]
-
-                    color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                    
-                    # Ensure width fits name
-                    font = cv2.FONT_HERSHEY_DUPLEX
-                    font_scale = 0.8
-                    thickness_text = 1
-                    (text_width, text_height), baseline = cv2.getTextSize(name, font, font_scale, thickness_text)
-                    if text_width + 20 > (right - left):
-                        center_x = (left + right) // 2
-                        half_w = (text_width + 20) // 2
-                        left = max(0, center_x - half_w)
-                        right = min(frame.shape[1], center_x + half_w)
-
-                    # Draw the rectangle
-                    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                    
-                    # Label above the head
-                    label_h = text_height + 15
-                    cv2.rectangle(frame, (left, top - label_h), (right, top), color, cv2.FILLED)
-                    cv2.putText(frame, name, (left + (right-left-text_width)//2, top - 6), font, font_scale, (255, 255, 255), thickness_text)
-
-                    # Dynamic corners
-                    line_length = min(w, h) // 4
-                    cv2.line(frame, (left, top), (left + line_length, top), color, 3)
-                    cv2.line(frame, (left, top), (left, top + line_length), color, 3)
-                    cv2.line(frame, (right, bottom), (right - line_length, bottom), color, 3)
-                    cv2.line(frame, (right, bottom), (right, bottom - line_length), color, 3)
-
-                window_title = 'Video Face Recognition (Press Q to quit)'
-                cv2.imshow(window_title, frame)
-
-                # Check for 'q' key OR ESC OR window closure
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q') or key == 27:
-                    print("Quitting via key press...")
-                    break
-                
-                # Press 's' to save snapshot
-                if key == ord('s'):
-                    if not os.path.exists('output'):
-                        os.makedirs('output')
-                    
-                    print("\n--- Snapshot Mode ---")
-                    custom_name = input("Enter a name for this snapshot (or press Enter for timestamp): ").strip()
-                    
-                    if custom_name:
-                        if not custom_name.lower().endswith('.jpg'):
-                            custom_name += '.jpg'
-                        filename = os.path.join("output", custom_name)
-                    else:
-                        import datetime
-                        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"output/snapshot_{timestamp}.jpg"
-                        
-                    cv2.imwrite(filename, frame)
-                    print(f"Snapshot saved to {filename}")
-                    print("Continuing video feed...\n")
-
-                # Check if window is still open
-                if cv2.getWindowProperty(window_title, cv2.WND_PROP_VISIBLE) < 1:
-                    print("Window closed by user. Quitting...")
+                if tracker is not None:
+                    faces = [(track.box, track.match) for track in tracker.update(frame) if track.match]
+                else:
+                    faces = self.recognize_frame(frame)
+                self.draw_video_faces(frame, faces)
+
+                if not headless and not self.show_video_frame(frame, window_title):
                     break
 
         except KeyboardInterrupt:
@@ -294,11 +415,38 @@ class FaceRecognitionApp:
             print(f"\nAn error occurred: {e}")
         finally:
             video_capture.release()
-            cv2.destroyAllWindows()
-            # Ensure windows are actually destroyed on all platforms
-            for _ in range(10):
-                cv2.waitKey(1)
+            if tracker is not None:
+                print(f"Tracking stats: {tracker.stats()}")
+            if not headless:
+                cv2.destroyAllWindows()
+                # Ensure windows are actually destroyed on all platforms
+                for _ in range(10):
+                    cv2.waitKey(1)
+            print("Camera released and windows closed.")
+
+    def _run_webcam_pipeline(self, video_capture, window_title, num_workers, headless, max_frames):
+        """Threaded variant of run_on_webcam; returns the pipeline's stage report."""
+        def render(frame, faces):
+            self.draw_video_faces(frame, faces or [])
+            return headless or self.show_video_frame(frame, window_title)
+
+        pipeline = FramePipeline(video_capture, self.recognize_frame, render,
+                                 num_workers=num_workers, max_frames=max_frames)
+        report = None
+        try:
+            report = pipeline.run(report_every=5.0)
+        except KeyboardInterrupt:
+            print("\nStopped by user (Ctrl+C)")
+            pipeline.stop()
+            report = pipeline.report()
+        finally:
+            if not headless:
+                cv2.destroyAllWindows()
+                for _ in range(10):
+                    cv2.waitKey(1)
             print("Camera released and windows closed.")
+        print(format_report(report))
+        return report
 
 
 if __name__ == "__main__":
@@ -307,8 +455,10 @@ if __name__ == "__main__":
     print("\nSelect mode:")
     print("1. Recognize in Static Image (via output/test.jpg.jpeg or command line)")
     print("2. Live Video Recognition (Webcam)")
+    print("3. Live Video Recognition (Webcam, threaded pipeline)")
+    print("4. Live Video Recognition (Webcam, detect every 5 frames + tracking)")
     
-    choice = input("Enter 1 or 2: ").strip()
+    choice = input("Enter 1, 2, 3 or 4: ").strip()
     
     if choice == '1':
         import sys
@@ -351,4 +501,4 @@ if __name__ == "__main__":
             print(f"Error: File '{img_path}' not found in the current folder, 'known_faces/', or 'output/'.")
     else:
         print("Starting webcam... (Press 's' to save snapshot, 'q' to quit)")
-        app.run_on_webcam()
+        app.run_on_webcam(threaded=(choice == '3'), track_every=5 if choice == '4' else None)
@@ -0,0 +1,208 @@
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+# ==========================================
+# DETECT EVERY N FRAMES, TRACK IN BETWEEN
+# ==========================================
+# Faces barely move between consecutive frames, so running HOG detection and
+# 128-d encoding on every frame is mostly wasted work. FaceTracker runs the
+# full detect (+ recognize) step every `detect_every` frames, or sooner when a
+# track loses confidence, and carries the boxes forward in between with a
+# cheap tracker:
+#   - "flow": Lucas-Kanade optical flow on corners inside each box (always available)
+#   - "kcf" / "csrt": OpenCV's trackers (need opencv-contrib-python)
+# Each track keeps a short history of recognized names and shows the most
+# common one, which stops names flickering between frames.
+#
+# Boxes are (top, right, bottom, left), like face_recognition.
+
+
+def box_iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _FlowTracker:
+    """Moves a box by the median optical-flow shift of corners found inside it."""
+
+    def __init__(self, gray, box):
+        self.box = box
+        self.points = self._find_points(gray, box)
+
+    @staticmethod
+    def _find_points(gray, box):
+        top, right, bottom, left = box
+        roi = gray[max(0, top):bottom, max(0, left):right]
+        if roi.size == 0:
+            return None
+        points = cv2.goodFeaturesToTrack(roi, maxCorners=40, qualityLevel=0.01, minDistance=3)
+        if points is None:
+            return None
+        points[:, 0, 0] += max(0, left)
+        points[:, 0, 1] += max(0, top)
+        return points.astype(np.float32)
+
+    def update(self, prev_gray, gray):
+        """Returns (ok, box, confidence)."""
+        if self.points is None or len(self.points) < 4:
+            return False, self.box, 0.0
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, self.points, None)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, moved, None)
+        # Forward-backward check: keep points that flow back to where they started
+        fb_error = np.linalg.norm((self.points - back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < 1.0)
+        confidence = float(good.mean())
+        if good.sum() < 4:
+            return False, self.box, confidence
+
+        dx, dy = np.median((moved - self.points).reshape(-1, 2)[good], axis=0)
+        top, right, bottom, left = self.box
+        dx, dy = int(round(dx)), int(round(dy))
+        self.box = (top + dy, right + dx, bottom + dy, left + dx)
+        self.points = moved[good].reshape(-1, 1, 2)
+        return True, self.box, confidence
+
+
+class _OpenCVTracker:
+    def __init__(self, factory, frame, box):
+        top, right, bottom, left = box
+        self.box = box
+        self.tracker = factory()
+        self.tracker.init(frame, (left, top, right - left, bottom - top))
+
+    def update(self, prev_gray, gray, frame=None):
+        ok, (x, y, w, h) = self.tracker.update(frame)
+        if ok:
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            self.box = (y, x + w, y + h, x)
+        return ok, self.box, 1.0 if ok else 0.0
+
+
+def opencv_tracker_factory(method):
+    """Returns a create() function for 'kcf'/'csrt', or None if this OpenCV build lacks it."""
+    attr = {"kcf": "TrackerKCF_create", "csrt": "TrackerCSRT_create"}[method]
+    for module in (cv2, getattr(cv2, "legacy", None)):
+        if module is not None and hasattr(module, attr):
+            return getattr(module, attr)
+    return None
+
+
+class Track:
+    def __init__(self, track_id, box, match=None, history=5):
+        self.track_id = track_id
+        self.box = box
+        self.confidence = 1.0
+        self._names = deque(maxlen=history)
+        self._matches = {}
+        self.match = None
+        if match is not None:
+            self.add_match(match)
+
+    def add_match(self, match):
+        """Records a recognition result; `match` becomes the most common recent name."""
+        self._names.append(match.name)
+        self._matches[match.name] = match
+        voted = Counter(self._names).most_common(1)[0][0]
+        self.match = self._matches[voted]
+
+    @property
+    def name(self):
+        return self.match.name if self.match is not None else None
+
+
+class FaceTracker:
+    """Runs detect_fn (+ recognize_fn) every N frames and tracks faces in between.
+
+    detect_fn(frame) -> [box, ...]
+    recognize_fn(frame, boxes) -> [MatchResult, ...]   (optional)
+    """
+
+    def __init__(self, detect_fn, recognize_fn=None, detect_every=5, method="flow",
+                 min_confidence=0.5, iou_threshold=0.3):
+        self.detect_fn = detect_fn
+        self.recognize_fn = recognize_fn
+        self.detect_every = max(1, detect_every)
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+
+        self._factory = None
+        if method in ("kcf", "csrt"):
+            self._factory = opencv_tracker_factory(method)
+            if self._factory is None:
+                print(f"OpenCV {method.upper()} tracker not available, using optical flow instead.")
+
+        self.tracks = []
+        self._trackers = {}
+        self._next_id = 0
+        self._prev_gray = None
+        self._since_detect = 0
+        self.frames = 0
+        self.detections = 0
+
+    def _start_tracker(self, frame, gray, box):
+        if self._factory is not None:
+            return _OpenCVTracker(self._factory, frame, box)
+        return _FlowTracker(gray, box)
+
+    def _detect(self, frame, gray):
+        boxes = self.detect_fn(frame)
+        matches = self.recognize_fn(frame, boxes) if self.recognize_fn and boxes else [None] * len(boxes)
+        self.detections += 1
+        self._since_detect = 0
+
+        # Keep the track id (and its name history) of the best-overlapping old track
+        unused = list(self.tracks)
+        tracks = []
+        for box, match in zip(boxes, matches):
+            best = max(unused, key=lambda t: box_iou(t.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= self.iou_threshold:
+                unused.remove(best)
+                best.box = box
+                best.confidence = 1.0
+                if match is not None:
+                    best.add_match(match)
+                track = best
+            else:
+                track = Track(self._next_id, box, match)
+                self._next_id += 1
+            tracks.append(track)
+
+        self.tracks = tracks
+        self._trackers = {t.track_id: self._start_tracker(frame, gray, t.box) for t in tracks}
+
+    def update(self, frame):
+        """Processes one frame; returns the current list of Track objects."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frames += 1
+
+        need_detect = self._prev_gray is None or self._since_detect + 1 >= self.detect_every
+        if not need_detect:
+            for track in self.tracks:
+                tracker = self._trackers[track.track_id]
+                if isinstance(tracker, _OpenCVTracker):
+                    ok, box, confidence = tracker.update(self._prev_gray, gray, frame)
+                else:
+                    ok, box, confidence = tracker.update(self._prev_gray, gray)
+                track.box, track.confidence = box, confidence
+                if not ok or confidence < self.min_confidence:
+                    need_detect = True  # lost a face: re-detect right away
+                    break
+
+        if need_detect:
+            self._detect(frame, gray)
+        else:
+            self._since_detect += 1
+        self._prev_gray = gray
+        return self.tracks
+
+    def stats(self):
+        """How many frames ran the full detect/encode step."""
+        ratio = self.frames / self.detections if self.detections else 0.0
+        return {"frames": self.frames, "detections": self.detections, "frames_per_detection": round(ratio, 2)}
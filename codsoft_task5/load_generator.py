@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+
+# ==========================================
+# LOAD GENERATOR FOR recognition_server.py
+# ==========================================
+# Opens --streams keep-alive connections (one per simulated camera) and sends
+# images to POST /recognize as fast as the server answers, for --duration
+# seconds. Reports throughput, latency percentiles and the batch sizes the
+# server formed. Uses a real photo with --image, otherwise a synthetic one.
+
+
+def synthetic_jpeg(width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    image = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    ok, jpeg = cv2.imencode(".jpg", image)
+    return jpeg.tobytes()
+
+
+async def open_connection(args):
+    if args.unix_socket:
+        return await asyncio.open_unix_connection(args.unix_socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def request(reader, writer, method, path, body=b"", headers=None):
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    for key, value in (headers or {}).items():
+        head += f"{key}: {value}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+
+    response_head = await reader.readuntil(b"\r\n\r\n")
+    lines = response_head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length"))
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def stream_client(stream_id, args, payload, deadline, latencies, batch_sizes, errors):
+    reader, writer = await open_connection(args)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, body = await request(reader, writer, "POST", "/recognize", payload,
+                                         {"X-Stream-Id": f"stream-{stream_id}"})
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+                batch_sizes.append(body.get("batch_size", 1))
+            else:
+                errors.append(body.get("error", status))
+    finally:
+        writer.close()
+
+
+async def run(args):
+    if args.image:
+        with open(args.image, "rb") as f:
+            payload = f.read()
+    else:
+        payload = synthetic_jpeg()
+
+    latencies, batch_sizes, errors = [], [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(stream_client(i, args, payload, deadline, latencies, batch_sizes, errors)
+                           for i in range(args.streams)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection(args)
+    _, server_stats = await request(reader, writer, "GET", "/stats")
+    writer.close()
+
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors: {errors[:3]})")
+        return
+    ms = np.asarray(latencies) * 1000
+    print(f"Streams: {args.streams} | Duration: {elapsed:.1f}s | Requests: {len(latencies)} ok, {len(errors)} failed")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} images/s")
+    print(f"Latency ms: p50 {np.percentile(ms, 50):.1f} | p90 {np.percentile(ms, 90):.1f} | "
+          f"p99 {np.percentile(ms, 99):.1f} | max {ms.max():.1f}")
+    print(f"Mean batch size seen by clients: {np.mean(batch_sizes):.2f}")
+    print(f"Server stats: {json.dumps(server_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for recognition_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket")
+    parser.add_argument("--streams", type=int, default=16, help="concurrent client streams")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--image", help="image to send (default: synthetic 640x480 JPEG)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,112 @@
-
 import cv2
 import face_recognition
 import os
 
-def process_image(image_path, known_faces_dir="known_faces", output_dir="output"):
+from encoding_cache import DEFAULT_DISK_DIR, EncodingCache
+from encoding_store import EncodingStore
+from face_matcher import FaceMatcher, identity_name
+
+# Shared by every call in this process; set FACE_ENCODING_CACHE_DIR to also keep
+# encodings on disk, so repeat runs skip encoding
+encoding_cache = EncodingCache(disk_dir=DEFAULT_DISK_DIR)
+
+def encode_known_face(path):
+    img = face_recognition.load_image_file(path)
+    enc = face_recognition.face_encodings(img)
+    return enc[0] if enc else None
+
+def load_gallery(known_faces_dir="known_faces"):
+    """Returns (encodings, names) for known_faces_dir, using the cached encoding store."""
+    if not os.path.exists(known_faces_dir):
+        return [], []
+    return EncodingStore(known_faces_dir).sync(lambda path: encoding_cache.encode_file(path, encode_known_face))
+
+def load_matcher(known_faces_dir="known_faces"):
+    encodings, names = load_gallery(known_faces_dir)
+    return FaceMatcher(encodings, [identity_name(n) for n in names])
+
+def process_image(image_path, known_faces_dir="known_faces", output_dir="output", matcher=None, quiet=False,
+                  output_path=None):
+    """Detects, recognizes and draws faces in one image.
+
+    Pass a prebuilt `matcher` to skip loading known faces (batch mode does).
+    The result goes to output_path, or <output_dir>/result_<file name> by default.
+    Returns a list of {"box", "name", "distance"} dicts, or None if the image can't be read.
+    """
     # Load known faces
-    known_encodings = []
-    known_names = []
-    
-    if os.path.exists(known_faces_dir):
-        for filename in os.listdir(known_faces_dir):
-            if filename.endswith((".jpg", ".png", ".jpeg")):
-                img = face_recognition.load_image_file(os.path.join(known_faces_dir, filename))
-                enc = face_recognition.face_encodings(img)
-                if enc:
-                    known_encodings.append(enc[0])
-                    known_names.append(os.path.splitext(filename)[0])
+    if matcher is None:
+        matcher = load_matcher(known_faces_dir)
 
     # Load test image
     image = cv2.imread(image_path)
     if image is None:
-        print("Error: Could not read test image.")
-        return
+        if not quiet:
+            print(f"Error: Could not read test image: {image_path}")
+        return None
 
     rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
+
     # Find faces
     face_locations = face_recognition.face_locations(rgb_image)
-    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    face_encodings = encoding_cache.face_encodings(rgb_image, face_locations)
 
-    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-        matches = face_recognition.compare_faces(known_encodings, face_encoding)
-        name = "Unknown"
+    # Best match within the default tolerance, all faces matched in one pass
+    match_results = matcher.match(face_encodings)
 
-        if True in matches:
-            first_match_index = matches.index(True)
-            name = known_names[first_match_index]
+    faces = []
+    for (top, right, bottom, left), match in zip(face_locations, match_results):
+        name = match.name
+        faces.append({"box": [top, right, bottom, left], "name": name, "distance": match.distance})
 
         # Draw box
         cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), 2)
         cv2.putText(image, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (0, 255, 0), 2)
 
     # Save output
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        
-    output_path = os.path.join(output_dir, "result_" + os.path.basename(image_path))
+    if output_path is None:
+        output_path = os.path.join(output_dir, "result_" + os.path.basename(image_path))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
     cv2.imwrite(output_path, image)
-    print(f"Result saved to: {output_path}")
+    if not quiet:
+        print(f"Result saved to: {output_path}")
+    return faces
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    
+
+    from batch_processing import expand_inputs, process_batch
+
+    parser = argparse.ArgumentParser(description="Recognize faces in one image, or in many with a process pool.")
+    parser.add_argument("inputs", nargs="*",
+                        help="image file(s), directories (searched recursively) or glob patterns")
+    parser.add_argument("--known-faces", default="known_faces")
+    parser.add_argument("--output", default="output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--resume", action="store_true", help="skip images already in output/manifest.jsonl")
+    args = parser.parse_args()
+
     # Check if image path is provided via command line
-    if len(sys.argv) > 1:
-        img_path = sys.argv[1]
-        process_image(img_path)
+    if len(args.inputs) == 1 and os.path.isfile(args.inputs[0]):
+        process_image(args.inputs[0], args.known_faces, args.output)
+    elif args.inputs:
+        images = expand_inputs(args.inputs, exclude=[args.output])
+        if not images:
+            print("No images matched the given inputs.")
+            sys.exit(1)
+        process_batch(images, args.known_faces, args.output, workers=args.workers, resume=args.resume)
     else:
         # Look for any image files in the current directory to process as a fallback
         valid_extensions = (".jpg", ".png", ".jpeg")
         images = [f for f in os.listdir('.') if f.lower().endswith(valid_extensions)]
-        
+
         if images:
             print(f"Found {len(images)} images in current directory. Processing the first one: {images[0]}")
+            print("(Pass a directory or glob, e.g. 'python process_static_image.py photos/', to process them all.)")
             process_image(images[0])
         else:
-            print("Usage: python process_static_image.py <path_to_image>")
+            print("Usage: python process_static_image.py <image | directory | glob> [--workers N] [--resume]")
             print("No image path provided and no images found in the current directory.")
             print("\nPlace an image in the 'known_faces' folder for recognition reference,")
             print("then run this script on a test image to see the output in the 'output' folder.")
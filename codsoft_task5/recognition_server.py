@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from face_recognition_app import FaceRecognitionApp
+
+# ==========================================
+# ASYNC MULTI-STREAM RECOGNITION SERVER
+# ==========================================
+# Serves FaceRecognitionApp over local HTTP (TCP or a Unix socket) to many
+# cameras / uploaders at once. Requests are grouped into micro-batches
+# (up to --max-batch images, waiting at most --max-wait-ms for the batch to
+# fill). Each batch is decoded, detected and encoded on a worker thread, then
+# every face in the batch is matched against the gallery in one matcher call.
+# known_faces/ is polled and the gallery is hot-reloaded when it changes.
+#
+#   POST /recognize[?annotate=1]   body: encoded image, header X-Stream-Id optional
+#   GET  /health                   GET /stats
+#
+# Malformed requests get 400, bodies over --max-body-mb get 413. The
+# annotated image (annotate=1) comes back base64-encoded in annotated_jpeg_base64.
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+MAX_BODY_BYTES = 20 * 2**20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    def __init__(self, app, max_batch=8, max_wait_ms=10, workers=2):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        self.queue = None
+        self.batches = 0
+        self.images = 0
+        self._tasks = []
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        # One collector per worker thread so batches can run side by side
+        self._tasks = [asyncio.ensure_future(self._collect()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, image_bytes, annotate=False, stream_id=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image_bytes, annotate, stream_id, time.perf_counter(), future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await loop.run_in_executor(self.executor, self._process, batch)
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            self.images += len(batch)
+            for item, result in zip(batch, results):
+                future = item[-1]
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _process(self, batch):
+        """Runs on a worker thread: decode + detect + encode per image, one match for the batch."""
+        matcher = self.app.matcher  # grab once: a hot reload may swap it mid-batch
+        # Failures are per image, so one bad upload doesn't fail the rest of its batch
+        decoded, per_image = [], []
+        for image_bytes, annotate, stream_id, queued_at, _ in batch:
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                decoded.append(None)
+                per_image.append(ValueError("could not decode image"))
+                continue
+            try:
+                locations, encodings = self.app.detect_and_encode(image)
+            except Exception as e:
+                decoded.append(None)
+                per_image.append(e)
+                continue
+            decoded.append(image)
+            per_image.append((locations, encodings))
+
+        all_encodings = [e for item in per_image if not isinstance(item, Exception) for e in item[1]]
+        all_matches = matcher.match(all_encodings, tolerance=0.5)
+
+        results, offset = [], 0
+        for (image_bytes, annotate, stream_id, queued_at, _), image, item in zip(batch, decoded, per_image):
+            if isinstance(item, Exception):
+                results.append(item)
+                continue
+            locations, encodings = item
+            matches = all_matches[offset:offset + len(encodings)]
+            offset += len(encodings)
+            result = {
+                "stream_id": stream_id,
+                "faces": [{"box": [int(v) for v in box], "name": m.name, "distance": m.distance}
+                          for box, m in zip(locations, matches)],
+                "batch_size": len(batch),
+                "latency_ms": round(1000 * (time.perf_counter() - queued_at), 2),
+            }
+            if annotate:
+                try:
+                    annotated = self.app.annotate_image(image, locations, matches, in_place=True)
+                    ok, jpeg = cv2.imencode(".jpg", annotated)
+                except Exception as e:
+                    results.append(e)
+                    continue
+                result["annotated_jpeg_base64"] = base64.b64encode(jpeg.tobytes()).decode("ascii") if ok else None
+            results.append(result)
+        return results
+
+
+def gallery_signature(known_faces_dir):
+    try:
+        entries = sorted(os.scandir(known_faces_dir), key=lambda e: e.name)
+    except FileNotFoundError:
+        return None
+    return tuple((e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                 for e in entries if e.name.endswith(IMAGE_EXTENSIONS))
+
+
+class RecognitionServer:
+    def __init__(self, app, batcher, reload_interval=2.0, max_body=MAX_BODY_BYTES):
+        self.app = app
+        self.batcher = batcher
+        self.reload_interval = reload_interval
+        self.max_body = max_body
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.reloads = 0
+
+    async def watch_gallery(self):
+        """Reloads known faces (only new/changed files get encoded) when the folder changes."""
+        loop = asyncio.get_running_loop()
+        signature = gallery_signature(self.app.known_faces_dir)
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            current = gallery_signature(self.app.known_faces_dir)
+            if current != signature:
+                signature = current
+                print("known_faces changed, reloading gallery...")
+                await loop.run_in_executor(None, self.app.load_known_faces)
+                self.reloads += 1
+
+    def stats(self):
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batcher.batches,
+            "avg_batch_size": round(self.batcher.images / self.batcher.batches, 2) if self.batcher.batches else None,
+            "queue_depth": self.batcher.queue.qsize(),
+            "gallery_reloads": self.reloads,
+            "known_people": len(self.app.matcher),
+            "encoding_cache": self.app.encoding_cache.stats(),
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body)
+                except HTTPError as e:
+                    # The rest of the stream can't be trusted, so answer and close
+                    self.errors += 1
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.route(method, target, headers, body)
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, body):
+        url = urlparse(target)
+        if method == "GET" and url.path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and url.path == "/stats":
+            return 200, self.stats()
+        if method == "POST" and url.path == "/recognize":
+            self.requests += 1
+            annotate = parse_qs(url.query).get("annotate", ["0"])[0] in ("1", "true")
+            try:
+                return 200, await self.batcher.submit(body, annotate, headers.get("x-stream-id"))
+            except ValueError as e:
+                self.errors += 1
+                return 400, {"error": str(e)}
+            except Exception as e:
+                self.errors += 1
+                return 500, {"error": str(e)}
+        return 404, {"error": "not found"}
+
+
+async def read_request(reader, max_body=MAX_BODY_BYTES):
+    """Minimal HTTP/1.1 request parser; returns None when the client closes the connection.
+
+    Raises HTTPError (400 malformed, 413 body larger than max_body).
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "request head too large")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise HTTPError(400, "malformed request line")
+    method, target, _ = parts
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > max_body:
+        raise HTTPError(413, f"body larger than {max_body} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+async def serve(args):
+    # Memory-only encoding cache: a long-running server would otherwise write a file per face crop
+    app = FaceRecognitionApp(args.known_faces, detection_budget=args.budget, encoding_cache_dir=None)
+    batcher = MicroBatcher(app, args.max_batch, args.max_wait_ms, args.workers)
+    server = RecognitionServer(app, batcher, args.reload_interval, int(args.max_body_mb * 2**20))
+    batcher.start()
+    watcher = asyncio.ensure_future(server.watch_gallery())
+
+    if args.unix_socket:
+        listener = await asyncio.start_unix_server(server.handle, path=args.unix_socket)
+        where = f"unix:{args.unix_socket}"
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+        where = f"http://{args.host}:{args.port}"
+    print(f"Recognition server listening on {where} (max batch {args.max_batch}, "
+          f"max wait {args.max_wait_ms} ms, {args.workers} worker(s))")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        watcher.cancel()
+        await batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async face recognition server with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--known-faces", default="known_faces")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="batches processed in parallel")
+    parser.add_argument("--budget", type=float, default=1.0, help="detection latency budget per image (s)")
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="seconds between known_faces checks")
+    parser.add_argument("--max-body-mb", type=float, default=MAX_BODY_BYTES / 2**20,
+                        help="largest accepted upload (MB); bigger requests get 413")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 import cv2
 
-def detect_faces():
+from face_tracker import FaceTracker
+
+def haar_face_boxes(face_cascade, frame):
+    """Runs the Haar cascade and returns boxes as (top, right, bottom, left)."""
+    # Convert to grayscale (Haar Cascades work better on grayscale)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in faces]
+
+def detect_faces(detect_every=None):
+    """Live Haar face detection; detect_every=N detects every N frames and tracks in between."""
     # Load pre-trained Haar Cascade classifier
     face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
+    tracker = None
+    if detect_every:
+        tracker = FaceTracker(lambda frame: haar_face_boxes(face_cascade, frame), detect_every=detect_every)
+
     # Initialize webcam
     cap = cv2.VideoCapture(0)
 
@@ -20,16 +34,16 @@ def detect_faces():
                 print("Failed to grab frame. Exiting...")
                 break
 
-            # Convert to grayscale (Haar Cascades work better on grayscale)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+            # Detect faces (or carry them forward with the tracker)
+            if tracker is not None:
+                boxes = [track.box for track in tracker.update(frame)]
+            else:
+                boxes = haar_face_boxes(face_cascade, frame)
 
             # Draw rectangles around faces
-            for (x, y, w, h) in faces:
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-                cv2.putText(frame, 'Face Detected', (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+            for (top, right, bottom, left) in boxes:
+                cv2.rectangle(frame, (left, top), (right, bottom), (255, 0, 0), 2)
+                cv2.putText(frame, 'Face Detected', (left, top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
 
             # Display output
             cv2.imshow(window_name, frame)
@@ -62,6 +76,8 @@ def detect_faces():
         print(f"\nAn error occurred: {e}")
     finally:
         cap.release()
+        if tracker is not None:
+            print(f"Tracking stats: {tracker.stats()}")
         cv2.destroyAllWindows()
         # On some systems, destroyAllWindows needs a bit of time or extra waitKey calls to actually close
         for _ in range(10):
@@ -70,4 +86,6 @@ def detect_faces():
 
 
 if __name__ == "__main__":
-    detect_faces()
+    import sys
+    # Optional argument: detect every N frames and track faces in between
+    detect_faces(int(sys.argv[1]) if len(sys.argv) > 1 else None)
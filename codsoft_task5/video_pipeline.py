@@ -0,0 +1,255 @@
+import heapq
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# ==========================================
+# STAGED CAPTURE / DETECT / RENDER PIPELINE
+# ==========================================
+# The serial webcam loop lets the detector's latency cap the frame rate while
+# frames pile up in the camera buffer. Here each stage runs on its own:
+#
+#   capture thread --[newest frame only]--> N detect/encode workers
+#                  --[bounded, drop-oldest]--> render (caller's thread)
+#
+# Results carry the frame's sequence number, so the render stage can put them
+# back in order even though workers finish out of order. Everything works
+# headless against a video file or SyntheticFrameSource, so no camera is needed.
+
+
+class Closed(Exception):
+    """Raised by DropOldestQueue.get once the queue is closed and empty."""
+
+
+class DropOldestQueue:
+    """Bounded queue where put() never blocks: a full queue drops its oldest item."""
+
+    def __init__(self, maxsize):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None, on_take=None):
+        """Returns the oldest item; on_take(item) runs before any other thread can look."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise Closed
+            item = self._items.popleft()
+            if on_take is not None:
+                on_take(item)
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """Frames-per-second counter for one stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.busy += seconds
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def avg_ms(self):
+        return 1000 * self.busy / self.count if self.count else 0.0
+
+
+class SyntheticFrameSource:
+    """cv2.VideoCapture stand-in producing numbered gray frames (for tests/benchmarks)."""
+
+    def __init__(self, num_frames=300, size=(480, 640), fps=None):
+        self.num_frames = num_frames
+        self.size = size
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next = 0
+
+    def read(self):
+        if self._next >= self.num_frames:
+            return False, None
+        if self.interval:
+            time.sleep(self.interval)
+        frame = np.full(self.size + (3,), self._next % 256, dtype=np.uint8)
+        self._next += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class FramePipeline:
+    """Runs process_fn(frame) on worker threads and render_fn(frame, result) in order.
+
+    process_fn returns whatever the renderer needs (e.g. a list of
+    (box, MatchResult)). render_fn returns False to stop the pipeline.
+    """
+
+    def __init__(self, source, process_fn, render_fn, num_workers=2, queue_size=4, max_frames=None):
+        self.source = source
+        self.process_fn = process_fn
+        self.render_fn = render_fn
+        self.num_workers = num_workers
+        self.max_frames = max_frames
+
+        self.frames = DropOldestQueue(1)            # capture keeps only the newest frame
+        self.results = DropOldestQueue(queue_size)  # workers -> render
+        self.stats = {"capture": StageStats(), "detect": StageStats(), "render": StageStats()}
+        self.late = 0  # results that arrived after a newer frame was already shown
+
+        self._stop = threading.Event()
+        self._in_flight = set()
+        self._next_untaken = 0  # every frame older than this has been taken by a worker
+        self._in_flight_lock = threading.Lock()
+        self._threads = []
+
+    # --- stages ---
+
+    def _capture(self):
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                if self.max_frames is not None and seq >= self.max_frames:
+                    break
+                start = time.perf_counter()
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+                self.stats["capture"].record(time.perf_counter() - start)
+                self.frames.put((seq, frame))
+                seq += 1
+        finally:
+            self.frames.close()
+
+    def _mark_in_flight(self, item):
+        with self._in_flight_lock:
+            self._in_flight.add(item[0])
+            self._next_untaken = item[0] + 1
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                seq, frame = self.frames.get(timeout=0.1, on_take=self._mark_in_flight)
+            except queue.Empty:
+                continue
+            except Closed:
+                break
+            start = time.perf_counter()
+            try:
+                result = self.process_fn(frame)
+            except Exception as e:
+                print(f"Worker error on frame {seq}: {e}")
+                result = None
+            self.stats["detect"].record(time.perf_counter() - start)
+            self.results.put((seq, frame, result))
+            with self._in_flight_lock:
+                self._in_flight.discard(seq)
+
+    # --- control ---
+
+    def report(self):
+        """Per-stage FPS / latency and current queue depths."""
+        report = {name: {"fps": round(s.fps(), 2), "avg_ms": round(s.avg_ms(), 2), "frames": s.count}
+                  for name, s in self.stats.items()}
+        report["queues"] = {
+            "frames": {"depth": len(self.frames), "dropped": self.frames.dropped},
+            "results": {"depth": len(self.results), "dropped": self.results.dropped},
+        }
+        report["late"] = self.late
+        return report
+
+    def run(self, report_every=None):
+        """Runs until the source ends or render_fn returns False; returns the final report."""
+        self._threads = [threading.Thread(target=self._capture, name="capture", daemon=True)]
+        self._threads += [threading.Thread(target=self._worker, name=f"worker-{i}", daemon=True)
+                          for i in range(self.num_workers)]
+        for t in self._threads:
+            t.start()
+
+        pending = []       # heap of (seq, frame, result) waiting for older frames
+        last_shown = -1
+        last_report = time.perf_counter()
+        try:
+            while True:
+                workers_alive = any(t.is_alive() for t in self._threads[1:])
+
+                # Snapshot *before* draining: every frame older than `oldest_pending`
+                # has already been queued by its worker, so the drain below sees it
+                with self._in_flight_lock:
+                    oldest_pending = min(self._in_flight) if self._in_flight else self._next_untaken
+                try:
+                    heapq.heappush(pending, self.results.get(timeout=0.05))
+                    while True:
+                        heapq.heappush(pending, self.results.get(timeout=0))
+                except queue.Empty:
+                    if not workers_alive and not pending:
+                        break
+
+                # Show a result once no worker still holds an older frame
+                keep_going = True
+                while pending and pending[0][0] < oldest_pending:
+                    seq, frame, result = heapq.heappop(pending)
+                    if seq < last_shown:
+                        self.late += 1
+                        continue
+                    last_shown = seq
+                    start = time.perf_counter()
+                    keep_going = self.render_fn(frame, result) is not False
+                    self.stats["render"].record(time.perf_counter() - start)
+                    if not keep_going:
+                        break
+                if not keep_going:
+                    break
+
+                if report_every and time.perf_counter() - last_report >= report_every:
+                    print(format_report(self.report()))
+                    last_report = time.perf_counter()
+        finally:
+            self.stop()
+        return self.report()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self.source.release()
+
+
+def format_report(report):
+    """One-line summary of FramePipeline.report()."""
+    stages = " | ".join(f"{name}: {report[name]['fps']:.1f} fps ({report[name]['avg_ms']:.1f} ms)"
+                        for name in ("capture", "detect", "render"))
+    queues = report["queues"]
+    return (f"{stages} | frame queue {queues['frames']['depth']} (dropped {queues['frames']['dropped']}) "
+            f"| result queue {queues['results']['depth']} (dropped {queues['results']['dropped']})")